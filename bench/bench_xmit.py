@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# bench/bench_xmit.py - Benchmarks of the IR transmit path on the stand-in pigpio backend
+# (c) 2021 @RR_Inyo
+# Released under the MIT license.
+# https://opensource.org/licenses/mit-license.php
+
+# Runs on any Linux host without a Raspberry Pi or pigpiod:
+#   python3 bench/bench_xmit.py [-n 1000] [--rtt 0]
+#
+# Reports, for the AEHA format, the NEC format and the two-frame Panasonic air conditioner command:
+# - synthesis time of the waveform elements and their DMA control blocks
+# - per-send latency (mean, p50, p99), chain length, airtime and link control blocks
+# - hit rate of the wavechain cache
+# - pigpio commands and round trips, taking the given round-trip time each, as to pigpiod on another host
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lib import fakepigpio
+fakepigpio.install()
+
+from lib import irxmit, irlightPanasonic, irlightNEC, iracPanasonic
+
+# Percentile of a sorted list
+def percentile(xs, p):
+    return xs[min(len(xs) - 1, int(len(xs) * p / 100))]
+
+# Benchmark sending a set of commands n times in turn
+def bench(name, format, send, n):
+    # Synthesis of waveform elements
+    t0 = time.perf_counter()
+    ir = irxmit.IRxmit(13, format = format)
+    t_synth = time.perf_counter() - t0
+    pi = fakepigpio.instances[-1]
+    synth_round_trips = pi.round_trips
+    element_cbs = sum(w.cbs for w in pi.waves.values())
+
+    # Sends
+    lat = []
+    for i in range(0, n):
+        t0 = time.perf_counter()
+        send(ir, i)
+        lat.append(time.perf_counter() - t0)
+    lat.sort()
+
+    chain = pi.chains[-1]
+    stats = ir.get_cache_stats()
+    hit_rate = stats['hits'] / max(1, stats['hits'] + stats['misses'])
+
+    print(f'{name}:')
+    print(f'  synthesis:   {t_synth * 1e3:8.3f} ms, {len(pi.waves)} waves, {element_cbs} CBs')
+    print(f'  send:        mean {sum(lat) / n * 1e6:8.1f} us, p50 {percentile(lat, 50) * 1e6:8.1f} us, p99 {percentile(lat, 99) * 1e6:8.1f} us')
+    print(f'  chain:       {len(chain)} waves, {pi.chain_micros(chain) / 1e3:.3f} ms airtime, {pi.chain_cbs} link CBs')
+    print(f'  cache:       {stats["hits"]} hits, {stats["misses"]} misses, hit rate {hit_rate * 100:.1f}%')
+    print(f'  pigpio:      {pi.commands} commands, {pi.round_trips} round trips, {pi.round_trips - synth_round_trips} in sends')
+
+# The main function
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'Benchmark the IR transmit path on the stand-in pigpio backend.')
+    parser.add_argument('-n', type = int, default = 1000, help = 'number of sends per benchmark')
+    parser.add_argument('--rtt', type = float, default = 0, help = 'round-trip time to pigpiod to simulate in milliseconds')
+    args = parser.parse_args()
+    fakepigpio.RTT = args.rtt / 1e3
+
+    # AEHA, all the commands of a Panasonic ceiling light on channel 1
+    light_commands = ['on', 'off', 'full', 'night', 'high', 'low', 'warm', 'cool']
+    def send_aeha(ir, i):
+        l = irlightPanasonic.IRlightPanasonic(ir, ch = 1)
+        getattr(l, light_commands[i % len(light_commands)])()
+    bench('AEHA (Panasonic ceiling light)', 'AEHA', send_aeha, args.n)
+
+    # NEC, all the commands of an NEC ceiling light
+    nec_commands = ['full', 'night', 'off']
+    def send_nec(ir, i):
+        l = irlightNEC.lightNEC(ir)
+        getattr(l, nec_commands[i % len(nec_commands)])()
+    bench('NEC (NEC ceiling light)', 'NEC', send_nec, args.n)
+
+    # Panasonic air conditioner, two frames per command, sweeping temperature settings
+    ac = None
+    def send_ac(ir, i):
+        nonlocal ac
+        if ac is None:
+            ac = iracPanasonic.IRACPanasonic(ir)
+        ac.on_heating(16 + i % 15)
+    bench('AEHA two-frame (Panasonic air conditioner)', 'AEHA', send_ac, args.n)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# bench/gen_sensorlog.py - Generator of synthetic DHT22 logs
+# (c) 2021 @RR_Inyo
+# Released under the MIT license.
+# https://opensource.org/licenses/mit-license.php
+
+# Writes a log in the format of lib/dht22.py, tab-separated time, temperature, and humidity,
+# ending now and covering days to months, with daily cycles and noise, e.g., for bench/loadtest.py:
+#   python3 bench/gen_sensorlog.py /tmp/DHT22_record.csv [--days 30] [--interval 60]
+
+import datetime
+import math
+import random
+
+# Generate a log of the given number of days, a reading every interval seconds, returning the number of readings
+def generate(path, days = 30, interval = 60, seed = 0):
+    rng = random.Random(seed)
+    n = int(days * 86400 / interval)
+    t0 = datetime.datetime.now() - datetime.timedelta(seconds = interval * n)
+    with open(path, 'w') as f:
+        lines = []
+        for i in range(0, n):
+            t = t0 + datetime.timedelta(seconds = interval * i)
+            phase = 2 * math.pi * (t.hour * 3600 + t.minute * 60 + t.second) / 86400
+            temp = 20 + 3 * math.sin(phase - 2.0) + 2 * math.sin(2 * math.pi * i * interval / (86400 * 27)) + rng.gauss(0, 0.1)
+            humid = 50 - 8 * math.sin(phase - 2.0) + rng.gauss(0, 0.5)
+            lines.append(f'{t.strftime("%Y-%m-%d %H:%M:%S.%f")}\t{temp:.1f}\t{humid:.1f}\n')
+            if len(lines) >= 10000:
+                f.write(''.join(lines))
+                lines = []
+        f.write(''.join(lines))
+    return n
+
+# The main function
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'Generate a synthetic DHT22 log.')
+    parser.add_argument('path', help = 'log file to write')
+    parser.add_argument('--days', type = float, default = 30, help = 'length of the log in days')
+    parser.add_argument('--interval', type = float, default = 60, help = 'interval of readings in seconds')
+    parser.add_argument('--seed', type = int, default = 0, help = 'seed of the noise')
+    args = parser.parse_args()
+
+    n = generate(args.path, args.days, args.interval, args.seed)
+    print(f'{n} readings written to {args.path}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# bench/loadtest.py - HTTP load test of the web app on the stand-in pigpio backend
+# (c) 2021 @RR_Inyo
+# Released under the MIT license.
+# https://opensource.org/licenses/mit-license.php
+
+# Runs on any Linux host without a Raspberry Pi or pigpiod:
+#   python3 bench/loadtest.py [--days 1,30,90] [-c 8] [-n 200]
+#
+# For each length of a synthetic DHT22 log, made by bench/gen_sensorlog.py, the web app is served
+# by the threaded server of server.py in a fresh process, and its routes are driven by concurrent clients:
+# - the dashboard, /
+# - the trend graph, /graph.png, served from its cache and requested with varying sizes, snapped to a few renders
+# - the control routes of the lights and the air conditioner, each waiting for the transmission, as T_WAIT in views
+#
+# Reports, per route, requests per second, latency (p50, p99, max), failed requests, and RSS of the server process.
+
+import http.client
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+PASSWORD = 'loadtest'
+
+# Routes: name, method, function of the request index returning (path, form), and number of requests relative to -n
+ROUTES = [
+    ('dashboard', 'GET', lambda i: ('/', None), 1),
+    ('graph (cached)', 'GET', lambda i: ('/graph.png', None), 1),
+    ('graph (varied w)', 'GET', lambda i: (f'/graph.png?w={400 + i % 400}', None), 0.25),
+    ('lightDining', 'POST', lambda i: ('/lightDining', {'command': ['on', 'full', 'night', 'off'][i % 4]}), 0.25),
+    ('lightLiving', 'POST', lambda i: ('/lightLiving', {'command': ['on', 'full', 'night', 'off'][i % 4]}), 0.25),
+    ('ac', 'POST', lambda i: ('/ac', {'command': 'heating', 'tempsetting': 16 + i % 15}), 0.25),
+]
+
+# Percentile of a sorted list
+def percentile(xs, p):
+    return xs[min(len(xs) - 1, int(len(xs) * p / 100))]
+
+# Resident set size of this process, [kB]
+def rss():
+    with open('/proc/self/status') as f:
+        for l in f:
+            if l.startswith('VmRSS:'):
+                return int(l.split()[1])
+    return 0
+
+# Send a request on a connection of its own, as browsers of several users would, returning the status
+def fetch(port, method, path, form = None, cookie = None):
+    headers = {}
+    body = None
+    if cookie is not None:
+        headers['Cookie'] = cookie
+    if form is not None:
+        body = urllib.parse.urlencode(form)
+        headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        headers['Accept'] = 'application/json'
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout = 60)
+    try:
+        conn.request(method, path, body, headers)
+        r = conn.getresponse()
+        r.read()
+        return r.status, r.getheader('Set-Cookie')
+    finally:
+        conn.close()
+
+# Log in, returning the session cookie
+def login(port):
+    status, cookie = fetch(port, 'POST', '/login', {'password': PASSWORD})
+    if status != 302 or cookie is None:
+        raise RuntimeError(f'Login failed with status {status}')
+    return cookie.split(';')[0]
+
+# Drive a route with n requests by c concurrent clients, returning (requests per second, sorted latencies, failures)
+def drive(port, cookie, method, make, n, c):
+    def one(i):
+        path, form = make(i)
+        t0 = time.perf_counter()
+        try:
+            status, _ = fetch(port, method, path, form, cookie)
+        except (OSError, http.client.HTTPException):
+            status = None
+        return time.perf_counter() - t0, status == 200
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(c) as pool:
+        results = list(pool.map(one, range(0, n)))
+    elapsed = time.perf_counter() - t0
+    return n / elapsed, sorted(r[0] for r in results), sum(1 for r in results if not r[1])
+
+# Serve the app in this process and drive its routes, as the child process of main()
+def run(n, c):
+    from lib import fakepigpio
+    fakepigpio.install()
+
+    from werkzeug.serving import make_server, WSGIRequestHandler
+    t0 = time.perf_counter()
+    from remoteir import app
+    t_import = time.perf_counter() - t0
+
+    # Without the access log, which would cost more than some of the routes
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded = True, request_handler = QuietHandler)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    port = server.server_port
+    cookie = login(port)
+
+    # The first request reads the whole log
+    t0 = time.perf_counter()
+    fetch(port, 'GET', '/', cookie = cookie)
+    t_first = time.perf_counter() - t0
+    print(f'  startup:     import {t_import * 1e3:.0f} ms, first dashboard {t_first * 1e3:.0f} ms, RSS {rss() / 1024:.1f} MB')
+
+    print(f'  {"route":18} {"requests":>8} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8} {"max ms":>8} {"failed":>6} {"RSS MB":>8}')
+    for name, method, make, share in ROUTES:
+        k = max(c, int(n * share))
+        rps, lat, failed = drive(port, cookie, method, make, k, c)
+        print(f'  {name:18} {k:8} {rps:8.1f} {percentile(lat, 50) * 1e3:8.1f} {percentile(lat, 99) * 1e3:8.1f} {lat[-1] * 1e3:8.1f} {failed:6} {rss() / 1024:8.1f}')
+    server.shutdown()
+
+# The main function
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'Load-test the web app on the stand-in pigpio backend.')
+    parser.add_argument('--days', default = '1,30,90', help = 'comma-separated lengths of the DHT22 log in days, one run each')
+    parser.add_argument('-c', type = int, default = 8, help = 'number of concurrent clients')
+    parser.add_argument('-n', type = int, default = 200, help = 'number of requests to the dashboard and the cached graph; other routes get a quarter')
+    parser.add_argument('--run', action = 'store_true', help = argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(args.n, args.c)
+        return
+
+    from bench import gen_sensorlog
+
+    for days in args.days.split(','):
+        with tempfile.TemporaryDirectory() as d:
+            csv_file = os.path.join(d, 'DHT22_record.csv')
+            readings = gen_sensorlog.generate(csv_file, float(days))
+            print(f'{days} days, {readings} readings, {os.path.getsize(csv_file) / 1e6:.1f} MB log, {args.c} clients:')
+
+            # Settings of the app, overriding remoteir/config.py
+            settings = os.path.join(d, 'settings.py')
+            with open(settings, 'w') as f:
+                f.write(f'CSV_FILE = {csv_file!r}\nPASSWORD = {PASSWORD!r}\nSECRET_KEY = {PASSWORD!r}\n')
+
+            # A fresh process per log, so that neither the data nor the caches nor RSS carry over
+            env = dict(os.environ, REMOTEIR_SETTINGS = settings)
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--run', '-n', str(args.n), '-c', str(args.c)],
+                           env = env, cwd = ROOT, check = True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# bench/verify_timing.py - Verifier of the timing of the IR waveform elements
+# (c) 2021 @RR_Inyo
+# Released under the MIT license.
+# https://opensource.org/licenses/mit-license.php
+
+# Runs on any Linux host without a Raspberry Pi or pigpiod:
+#   python3 bench/verify_timing.py [--carrier 38000] [--duty 0.5] [--tolerance 1]
+#
+# Reports, for each element of the AEHA and the NEC formats, as created on the stand-in pigpio backend:
+# - mark and space, and their errors against the nominal timing of the format
+# - carrier frequency and duty cycle actually synthesized
+# - largest drift of the carrier cycles from the nominal carrier frequency
+# Exits with status 1 if any mark or space is off by more than the tolerance.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lib import fakepigpio
+fakepigpio.install()
+
+from lib import irxmit
+
+# The main function
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'Verify the timing of the IR waveform elements against the formats.')
+    parser.add_argument('--carrier', type = float, default = irxmit.CARRIER, help = 'carrier frequency in Hz')
+    parser.add_argument('--duty', type = float, default = irxmit.DUTY, help = 'duty cycle of the carrier')
+    parser.add_argument('--tolerance', type = float, default = 1, help = 'tolerance of marks and spaces in microseconds')
+    args = parser.parse_args()
+
+    failed = False
+    for format in irxmit.PROTOCOLS:
+        ir = irxmit.IRxmit(13, format = format, carrier = args.carrier, duty = args.duty)
+        print(f'{format}, {args.carrier / 1e3:.2f} kHz, duty {args.duty:.3f}:')
+        print(f'  {"element":8} {"mark us":>9} {"error":>7} {"space us":>9} {"error":>7} {"kHz":>7} {"duty":>6} {"drift us":>8}')
+        for name, r in ir.verify_timing().items():
+            print(f'  {name:8} {r["mark"]:9.1f} {r["mark_error"]:+7.1f} {r["space"]:9.1f} {r["space_error"]:+7.1f} '
+                  f'{r["carrier"] / 1e3:7.3f} {r["duty"]:6.3f} {r["drift"]:8.2f}')
+            if abs(r['mark_error']) > args.tolerance or abs(r['space_error']) > args.tolerance:
+                failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# codebook.py - Compiled binary codebooks of IR remote control commands
+# (c) 2021 @RR_Inyo
+# Released under the MIT license.
+# https://opensource.org/licenses/mit-license.php
+
+# A codebook holds the commands of every device, compiled offline from the hexadecimal strings
+# defined in the device modules, so that the runtime only has to memory-map a single file.
+#
+# Usage:
+#   python3 lib/codebook.py codebook.bin
+#
+# File layout, all integers little-endian:
+# - Header: magic 'RIRC', version (u16), reserved (u16), number of entries (u32)
+# - Index: one record per entry, sorted by key
+#   key offset (u32), key length (u16), protocol ID (u8), padding (u8), number of bits (u16),
+#   frame offset (u32), frame length (u16), chain offset (u32), chain length (u16)
+# - Blob: keys as 'device/command' in UTF-8, raw frame bytes, and chain descriptors
+#
+# A chain descriptor is a sequence of element codes (leader, data '0', data '1', trailer) defined in irframe.py,
+# which IRxmit.send_chain() translates into a pigpio wavechain without parsing any hexadecimal string.
+
+import collections
+import mmap
+import struct
+
+# Encoding of frames and the commands of the devices, none of which needs pigpio
+# They are imported as modules of the lib package, or directly if this module is run as a script.
+try:
+    from lib import irframe, irlightPanasonic, irlightNEC, iracPanasonic
+except ImportError:
+    import irframe
+    import irlightPanasonic
+    import irlightNEC
+    import iracPanasonic
+
+# For debugging
+DEBUG = False
+
+MAGIC = b'RIRC'
+VERSION = 1
+HEADER = struct.Struct('<4sHHI')
+RECORD = struct.Struct('<IHBxHIHIH')
+
+# An entry of the codebook
+Entry = collections.namedtuple('Entry', ['protocol', 'nbits', 'frame', 'chain'])
+
+# Class of compiled codebook, memory-mapped at runtime
+class Codebook():
+    # Constructor
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.__mm = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+
+        # Check header
+        magic, version, _, self.__n = HEADER.unpack_from(self.__mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a codebook.')
+        if version != VERSION:
+            raise ValueError(f'Unsupported codebook version {version}.')
+
+        # Cache of entries already looked up
+        self.__cache = {}
+        if DEBUG: print(f'Codebook {path} with {self.__n} entries mapped...')
+
+    # Destructor
+    def __del__(self):
+        self.__mm.close()
+
+    def __len__(self):
+        return self.__n
+
+    # Get the key of the i-th record in the index
+    def __key(self, i):
+        key_off, key_len = struct.unpack_from('<IH', self.__mm, HEADER.size + i * RECORD.size)
+        return self.__mm[key_off: key_off + key_len]
+
+    # List all the keys as 'device/command'
+    def keys(self):
+        return [self.__key(i).decode() for i in range(0, self.__n)]
+
+    # Look up an entry by binary search over the sorted index
+    def lookup(self, device, command):
+        key = f'{device}/{command}'
+        if key in self.__cache:
+            return self.__cache[key]
+
+        target = key.encode()
+        lo, hi = 0, self.__n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.__key(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.__n or self.__key(lo) != target:
+            raise KeyError(key)
+
+        _, _, protocol, nbits, frame_off, frame_len, chain_off, chain_len = RECORD.unpack_from(self.__mm, HEADER.size + lo * RECORD.size)
+        entry = Entry(protocol, nbits, self.__mm[frame_off: frame_off + frame_len], self.__mm[chain_off: chain_off + chain_len])
+        self.__cache[key] = entry
+        return entry
+
+# Compile commands into a codebook
+# commands: dictionary of (device, command) to (format, hexadecimal string)
+def compile_commands(commands, path):
+    items = sorted((f'{device}/{command}'.encode(), format, s) for (device, command), (format, s) in commands.items())
+
+    # Lay out the blob after the header and the index
+    index = bytearray()
+    blob = bytearray()
+    base = HEADER.size + RECORD.size * len(items)
+    for key, format, s in items:
+        bits = irframe.get_bitstream(s)
+        frame = bytes.fromhex(s.replace('++', ''))
+        chain = irframe.get_chain_descriptor(bits)
+        nbits = len(bits) - bits.count('+')
+
+        key_off = base + len(blob)
+        blob += key
+        frame_off = base + len(blob)
+        blob += frame
+        chain_off = base + len(blob)
+        blob += chain
+
+        index += RECORD.pack(key_off, len(key), irframe.PROTOCOLS[format], nbits, frame_off, len(frame), chain_off, len(chain))
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(items)))
+        f.write(index)
+        f.write(blob)
+    if DEBUG: print(f'Codebook {path} with {len(items)} entries written...')
+
+# Collect the commands of all the devices supported by this project
+def collect():
+    commands = {}
+    for ch in [1, 2, 3]:
+        for command, s in irlightPanasonic.IRlightPanasonic.codes(ch).items():
+            commands[(f'lightPanasonic.ch{ch}', command)] = ('AEHA', s)
+    for command, s in irlightNEC.lightNEC.codes().items():
+        commands[('lightNEC', command)] = ('NEC', s)
+    for command, s in iracPanasonic.IRACPanasonic.codes().items():
+        commands[(iracPanasonic.IRACPanasonic.DEVICE, command)] = ('AEHA', s)
+    return commands
+
+# The main function, the codebook compiler
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'Compile IR remote control commands into a binary codebook.')
+    parser.add_argument('output', help = 'path to the codebook file to write')
+    args = parser.parse_args()
+
+    commands = collect()
+    compile_commands(commands, args.output)
+    print(f'{len(commands)} commands compiled into {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# dht22.py - DHT22 (aka AM2302) temperature and humidity sampler
+# (c) 2021 @RR_Inyo
+# Released under the MIT license.
+# https://opensource.org/licenses/mit-license.php
+
+# The sensor is read with pigpio edge callbacks: after a start signal, it sends 40 bits,
+# each as a 50-us low followed by a 26-28-us high for '0' or a 70-us high for '1'.
+# The bits are humidity (16 bits), temperature (16 bits, sign-magnitude), and checksum (8 bits).
+#
+# Readings are published into a ring buffer in shared memory, so that any process, e.g., web workers,
+# can read the latest value and the recent history without file I/O.
+# The ring buffer is protected by a sequence lock, as there is a single writer.
+# Readings are also appended to the log file in batches, in the format of the former external logger.
+#
+# Usage, to run the sampler as a process of its own:
+#   python3 lib/dht22.py [--gpio 4] [--csv /tmp/DHT22_record.csv]
+
+import datetime
+import pigpio
+import struct
+import threading
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+# For debugging
+DEBUG = False
+
+SHM_NAME = 'remoteir_dht22'
+CAPACITY = 10080        # [readings], a week at the default interval
+INTERVAL = 60           # [s], sampling interval; the DHT22 must not be read more often than every 2 s
+FLUSH_INTERVAL = 600    # [s], interval to append readings to the log file
+T_START = 0.018         # [s], start signal
+T_READ = 0.05           # [s], time to wait for the 40 bits
+HIGH_1 = 50             # [microsec], highs longer than this are '1'
+
+HEADER = struct.Struct('<IIQ')      # Sequence lock, capacity, number of readings written
+RECORD = struct.Struct('<ddd')      # Time in seconds since the epoch, temperature, humidity
+
+# Decode the widths of the highs of a frame, in microseconds, into (temperature, humidity)
+# Returns None if the frame is incomplete or the checksum does not match.
+def decode(highs):
+    # The last 40 highs are the data, following the 80-us high of the response
+    if len(highs) < 40:
+        return None
+    bits = 0
+    for w in highs[-40:]:
+        bits = bits << 1 | (w > HIGH_1)
+    data = bits.to_bytes(5, 'big')
+    if (data[0] + data[1] + data[2] + data[3]) & 0xff != data[4]:
+        if DEBUG: print(f'Checksum error: {data.hex()}')
+        return None
+    humid = (data[0] << 8 | data[1]) / 10
+    temp = ((data[2] & 0x7f) << 8 | data[3]) / 10
+    if data[2] & 0x80:
+        temp = -temp
+    return temp, humid
+
+# Encode (temperature, humidity) into the widths of the highs, including the response, e.g., for replay
+def encode(temp, humid):
+    t = round(abs(temp) * 10) | (0x8000 if temp < 0 else 0)
+    h = round(humid * 10)
+    data = [h >> 8, h & 0xff, t >> 8, t & 0xff]
+    data.append(sum(data) & 0xff)
+    return [80] + [70 if b >> (7 - k) & 1 else 27 for b in data for k in range(0, 8)]
+
+# Ring buffer of readings in shared memory
+class SensorBuffer():
+    # Constructor
+    # The sampler creates the buffer, and the other processes attach to it by name.
+    # Creating fails if the buffer exists, as another sampler would be driving the same sensor.
+    def __init__(self, name = SHM_NAME, capacity = CAPACITY, create = False):
+        if create:
+            try:
+                self.__shm = shared_memory.SharedMemory(name = name, create = True, size = HEADER.size + RECORD.size * capacity)
+            except FileExistsError:
+                raise FileExistsError(f'Shared memory {name} exists, used by another DHT22 sampler. '
+                                      f'Attach to it instead, or remove /dev/shm/{name} if no sampler is running.') from None
+            HEADER.pack_into(self.__shm.buf, 0, 0, capacity, 0)
+        else:
+            self.__shm = shared_memory.SharedMemory(name = name)
+            # Keep the resource tracker of this process from unlinking the buffer of the sampler at exit
+            resource_tracker.unregister(self.__shm._name, 'shared_memory')
+        self.__creator = create
+        self.__capacity = HEADER.unpack_from(self.__shm.buf, 0)[1]
+
+    # Release, and remove if created by this process
+    def close(self):
+        self.__shm.close()
+        if self.__creator:
+            self.__shm.unlink()
+
+    # Append a reading, by the single writer
+    def append(self, t, temp, humid):
+        buf = self.__shm.buf
+        seq, capacity, count = HEADER.unpack_from(buf, 0)
+        HEADER.pack_into(buf, 0, seq + 1, capacity, count)     # Odd while writing
+        RECORD.pack_into(buf, HEADER.size + RECORD.size * (count % capacity), t, temp, humid)
+        HEADER.pack_into(buf, 0, seq + 2, capacity, count + 1)
+
+    # Read consistently, retrying while the writer is writing
+    def __read(self, n):
+        buf = self.__shm.buf
+        while True:
+            seq, capacity, count = HEADER.unpack_from(buf, 0)
+            if seq & 1:
+                time.sleep(0)
+                continue
+            n_read = min(n, count, capacity)
+            records = [RECORD.unpack_from(buf, HEADER.size + RECORD.size * (i % capacity)) for i in range(count - n_read, count)]
+            if HEADER.unpack_from(buf, 0)[0] == seq:
+                return records
+
+    # Get the latest reading as (time, temperature, humidity), or None if nothing has been read yet
+    def latest(self):
+        records = self.__read(1)
+        return records[0] if records else None
+
+    # Get the recent readings, oldest first, all of them in the buffer if n is None
+    def history(self, n = None):
+        return self.__read(self.__capacity if n is None else n)
+
+    # Number of readings the buffer holds at most
+    def capacity(self):
+        return self.__capacity
+
+    # Number of readings written so far, to tell whether there is a new one
+    def count(self):
+        return HEADER.unpack_from(self.__shm.buf, 0)[2]
+
+# Class of DHT22 sampler
+class DHT22Sampler():
+    # Constructor
+    # pi: pigpio handler, pin: GPIO pin connected to the data line of the DHT22
+    def __init__(self, pi, pin, csv_file = None, interval = INTERVAL, flush_interval = FLUSH_INTERVAL, name = SHM_NAME):
+        self.__pi = pi
+        self.__pin = pin
+        self.__csv_file = csv_file
+        self.__interval = interval
+        self.__flush_interval = flush_interval
+        self.buffer = SensorBuffer(name, create = True)
+
+        # Widths of the highs of the current frame
+        self.__highs = []
+        self.__tick_rise = None
+        self.__cb = self.__pi.callback(self.__pin, pigpio.EITHER_EDGE, self.__edge)
+
+        # Readings to flush to the log file
+        self.__pending = []
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    # Callback on each edge, measuring the width of highs
+    def __edge(self, gpio, level, tick):
+        if level == 1:
+            self.__tick_rise = tick
+        elif level == 0 and self.__tick_rise is not None:
+            self.__highs.append((tick - self.__tick_rise) & 0xffffffff)
+            self.__tick_rise = None
+
+    # Read the sensor once, returning (temperature, humidity), or None on failure
+    def read(self):
+        self.__highs = []
+        self.__tick_rise = None
+
+        # Start signal: pull the line low, then release it to the pull-up resistor
+        self.__pi.set_mode(self.__pin, pigpio.OUTPUT)
+        self.__pi.write(self.__pin, 0)
+        time.sleep(T_START)
+        self.__pi.set_mode(self.__pin, pigpio.INPUT)
+        time.sleep(T_READ)
+
+        return decode(self.__highs)
+
+    # Sample, publish, and log once, retrying a failed read once
+    def sample(self):
+        reading = self.read()
+        if reading is None:
+            time.sleep(2)
+            reading = self.read()
+        if reading is None:
+            if DEBUG: print('Failed to read DHT22')
+            return None
+        t = time.time()
+        temp, humid = reading
+        self.buffer.append(t, temp, humid)
+        if self.__csv_file is not None:
+            self.__pending.append(f'{datetime.datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S.%f")}\t{temp}\t{humid}\n')
+        if DEBUG: print(f'{temp} degree Celcius, {humid}%')
+        return reading
+
+    # Append the pending readings to the log file in a single write
+    def flush(self):
+        if not self.__pending:
+            return
+        lines, self.__pending = self.__pending, []
+        with open(self.__csv_file, 'a') as f:
+            f.write(''.join(lines))
+
+    # Sampling thread
+    def __run(self):
+        t_flush = time.monotonic()
+        while not self.__stop.is_set():
+            t0 = time.monotonic()
+            self.sample()
+            if time.monotonic() - t_flush >= self.__flush_interval:
+                self.flush()
+                t_flush = time.monotonic()
+            self.__stop.wait(max(0, self.__interval - (time.monotonic() - t0)))
+        self.flush()
+
+    def start(self):
+        self.__thread = threading.Thread(target = self.__run, daemon = True)
+        self.__thread.start()
+
+    # Stop sampling, flushing the pending readings
+    def stop(self):
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+        self.__cb.cancel()
+        self.buffer.close()
+
+# The main function, to run the sampler as a process of its own
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'DHT22 sampler of Remoteir.')
+    parser.add_argument('--gpio', type = int, default = 4, help = 'GPIO pin connected to the DHT22')
+    parser.add_argument('--csv', default = '/tmp/DHT22_record.csv', help = 'log file to append readings to')
+    parser.add_argument('--interval', type = float, default = INTERVAL, help = 'sampling interval in seconds')
+    args = parser.parse_args()
+
+    s = DHT22Sampler(pigpio.pi(), args.gpio, csv_file = args.csv, interval = args.interval)
+    s.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        s.stop()
+
+if __name__ == '__main__':
+    main()
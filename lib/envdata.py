@@ -0,0 +1,152 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# envdata.py - Environment data of multiple named sensors, e.g., in several rooms
+# (c) 2021 @RR_Inyo
+# Released under the MIT license.
+# https://opensource.org/licenses/mit-license.php
+
+# Each sensor has its own series of readings, kept sorted by time so that ranges are found by binary search.
+# A series is refreshed incrementally: only the readings added since the previous refresh are parsed,
+# whether they come from a log file of tab-separated time, temperature, and humidity, or from a DHT22 ring buffer.
+
+import bisect
+import datetime
+import os
+import threading
+
+# For debugging
+DEBUG = False
+
+# Series of readings of a sensor, sorted by time
+class Series():
+    # Constructor
+    def __init__(self):
+        self.t = []
+        self.temp = []
+        self.humid = []
+        self.lock = threading.Lock()
+
+    # Add a reading, keeping the series sorted even if readings arrive out of order
+    def add(self, t, temp, humid):
+        if self.t and t < self.t[-1]:
+            i = bisect.bisect_right(self.t, t)
+            self.t.insert(i, t)
+            self.temp.insert(i, temp)
+            self.humid.insert(i, humid)
+        else:
+            self.t.append(t)
+            self.temp.append(temp)
+            self.humid.append(humid)
+
+    # Read the readings added to the source since the previous refresh
+    def refresh(self):
+        pass
+
+    # Get the latest reading as (time, temperature, humidity), or None if there is none
+    def latest(self):
+        with self.lock:
+            self.refresh()
+            if not self.t:
+                return None
+            return self.t[-1], self.temp[-1], self.humid[-1]
+
+    # Get a version of the data, changing whenever readings are added
+    def version(self):
+        with self.lock:
+            self.refresh()
+            return len(self.t), self.t[-1] if self.t else None
+
+    # Get the readings between t0 and t1, both inclusive and None for unbounded, as lists of times, temperatures, and humidities
+    def range(self, t0 = None, t1 = None):
+        with self.lock:
+            self.refresh()
+            i = 0 if t0 is None else bisect.bisect_left(self.t, t0)
+            j = len(self.t) if t1 is None else bisect.bisect_right(self.t, t1)
+            return self.t[i:j], self.temp[i:j], self.humid[i:j]
+
+# Series read from a log file, tab-separated time, temperature, and humidity
+class CSVSeries(Series):
+    def __init__(self, path):
+        super().__init__()
+        self.__path = path
+        self.__offset = 0
+
+    # Parse the lines appended since the previous refresh
+    def refresh(self):
+        try:
+            size = os.path.getsize(self.__path)
+        except OSError:
+            return
+        if size < self.__offset:
+            # Truncated or replaced, e.g., after a reboot
+            self.t, self.temp, self.humid = [], [], []
+            self.__offset = 0
+        if size == self.__offset:
+            return
+        with open(self.__path, 'rb') as f:
+            f.seek(self.__offset)
+            data = f.read(size - self.__offset)
+
+        # Leave an incomplete last line for the next refresh
+        end = data.rfind(b'\n') + 1
+        self.__offset += end
+        for l in data[:end].decode().splitlines():
+            fields = l.split('\t')
+            if len(fields) < 3:
+                continue
+            try:
+                self.add(datetime.datetime.fromisoformat(fields[0]), float(fields[1]), float(fields[2]))
+            except ValueError:
+                if DEBUG: print(f'Line skipped in {self.__path}: {l}')
+
+# Series read from a DHT22 ring buffer in shared memory
+class BufferSeries(Series):
+    def __init__(self, buffer):
+        super().__init__()
+        self.__buffer = buffer
+        self.__count = 0
+
+    # Take the readings written since the previous refresh, keeping no more than the buffer holds
+    def refresh(self):
+        count = self.__buffer.count()
+        if count == self.__count:
+            return
+        for t, temp, humid in self.__buffer.history(count - self.__count):
+            self.add(datetime.datetime.fromtimestamp(t), temp, humid)
+        self.__count = count
+        excess = len(self.t) - self.__buffer.capacity()
+        if excess > 0:
+            del self.t[:excess], self.temp[:excess], self.humid[:excess]
+
+# Environment data of named sensors
+class Environment():
+    # Constructor
+    def __init__(self):
+        self.__series = {}
+
+    # Add a sensor; the first one added is the primary one
+    def add(self, name, series):
+        self.__series[name] = series
+
+    def names(self):
+        return list(self.__series)
+
+    def series(self, name):
+        return self.__series[name]
+
+    # Get the latest reading of the primary sensor
+    def latest(self):
+        return next(iter(self.__series.values())).latest()
+
+    # Get the latest readings of all the sensors as a dictionary of name to (time, temperature, humidity)
+    def latest_all(self):
+        return {name: s.latest() for name, s in self.__series.items()}
+
+    # Get a version of the data of all the sensors, e.g., to cache what is made of it
+    def version(self):
+        return tuple(s.version() for s in self.__series.values())
+
+    # Get the readings of the given sensors, all by default, between t0 and t1 as a dictionary of name to series
+    def range(self, names = None, t0 = None, t1 = None):
+        return {name: self.__series[name].range(t0, t1) for name in (names or self.__series)}
@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# eventhub.py - Fan-out of events from a single producer to all subscribers
+# (c) 2021 @RR_Inyo
+# Released under the MIT license.
+# https://opensource.org/licenses/mit-license.php
+
+# A single producer thread polls the sources of events, e.g., new sensor readings, only while someone subscribes,
+# and every event is put into the queue of each subscriber, e.g., a Server-Sent Events stream of the web app.
+# Events can also be published directly, e.g., right after a command is sent.
+
+import json
+import queue
+import threading
+
+# For debugging
+DEBUG = False
+
+QUEUE_SIZE = 64     # [events], per subscriber; events for a subscriber too slow to take them are dropped
+
+# Format an event for Server-Sent Events
+def format_sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+# Class of event hub
+class EventHub():
+    # Constructor
+    # poll: function returning a list of (event, data) since the previous call, interval: [s], polling interval
+    def __init__(self, poll, interval = 1.0):
+        self.__poll = poll
+        self.__interval = interval
+        self.__lock = threading.Lock()
+        self.__subscribers = set()
+        self.__thread = None
+        self.__wakeup = threading.Event()
+
+    # Subscribe, getting a queue of (event, data)
+    def subscribe(self):
+        q = queue.Queue(QUEUE_SIZE)
+        with self.__lock:
+            self.__subscribers.add(q)
+            if self.__thread is None:
+                self.__thread = threading.Thread(target = self.__produce, daemon = True)
+                self.__thread.start()
+        if DEBUG: print(f'{len(self.__subscribers)} subscribers')
+        return q
+
+    def unsubscribe(self, q):
+        with self.__lock:
+            self.__subscribers.discard(q)
+
+    # Put an event into the queues of all the subscribers
+    def publish(self, event, data):
+        with self.__lock:
+            subscribers = list(self.__subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait((event, data))
+            except queue.Full:
+                if DEBUG: print(f'Event {event} dropped for a slow subscriber')
+
+    # Producer thread, polling while there are subscribers
+    def __produce(self):
+        while True:
+            with self.__lock:
+                if not self.__subscribers:
+                    self.__thread = None
+                    return
+            try:
+                for event, data in self.__poll():
+                    self.publish(event, data)
+            except Exception as e:
+                if DEBUG: print(f'Polling failed: {e}')
+            self.__wakeup.wait(self.__interval)
+
+    # Generator of an SSE stream for a subscriber, with keepalive comments
+    def stream(self, keepalive = 15):
+        q = self.subscribe()
+        try:
+            while True:
+                try:
+                    event, data = q.get(timeout = keepalive)
+                    yield format_sse(event, data)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+        finally:
+            self.unsubscribe(q)
@@ -0,0 +1,307 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# fakepigpio.py - A stand-in for the pigpio module, for measurements without a Raspberry Pi
+# (c) 2021 @RR_Inyo
+# Released under the MIT license.
+# https://opensource.org/licenses/mit-license.php
+
+# This module mimics the part of the pigpio API used by this project.
+# Instead of driving GPIO pins, it records pulses, waves and wavechains,
+# and computes the airtime and the DMA control block usage of what would have been transmitted.
+# Commands written to the command socket, sl.s, as by a pipeline of irxmit, are executed as well,
+# and round trips to pigpiod are counted, optionally taking a simulated round-trip time.
+#
+# Usage:
+#   import fakepigpio
+#   fakepigpio.install()    # Must precede the import of irxmit
+#   from lib import irxmit
+
+import struct
+import sys
+import threading
+import time
+
+# For debugging
+DEBUG = False
+
+# Constants, as in pigpio
+INPUT = 0
+OUTPUT = 1
+RISING_EDGE = 0
+FALLING_EDGE = 1
+EITHER_EDGE = 2
+TIMEOUT = 2
+
+# Limits of the DMA waveforms, as reported by pigpiod with the default settings
+MAX_PULSES = 12000
+MAX_MICROS = 1800000000
+MAX_CBS = 25016
+MAX_CHAIN_BYTES = 600
+
+# All the handlers created, for inspection by benchmarks
+instances = []
+
+# [s], round-trip time to simulate, e.g., of pigpiod on another host
+RTT = 0.0
+
+# Exception, as in pigpio
+class error(Exception):
+    pass
+
+# Pulse, as in pigpio
+class pulse():
+    def __init__(self, gpio_on, gpio_off, delay):
+        self.gpio_on = gpio_on
+        self.gpio_off = gpio_off
+        self.delay = delay
+
+# Callback handle, as in pigpio
+class _callback():
+    def __init__(self, pi, gpio, edge, func):
+        self.pi = pi
+        self.gpio = gpio
+        self.edge = edge
+        self.func = func
+
+    def cancel(self):
+        self.pi._cancel(self)
+
+# Command socket of pigpio.pi and its lock, executing the commands written to it, e.g., by irxmit.Transport.pipeline()
+class _socklock():
+    def __init__(self, pi):
+        self.s = _socket(pi)
+        self.l = threading.Lock()
+
+class _socket():
+    def __init__(self, pi):
+        self.__pi = pi
+        self.__responses = bytearray()
+        self.__sent = False
+
+    def sendall(self, data):
+        self.__responses.extend(self.__pi._execute(bytes(data)))
+        self.__sent = True
+
+    # Waiting for responses after sending commands is a round trip
+    def recv(self, n):
+        if self.__sent:
+            self.__pi.round_trips += 1
+            self.__sent = False
+            if RTT: time.sleep(RTT)
+        data = bytes(self.__responses[:n])
+        del self.__responses[:n]
+        return data
+
+# Waveform created from pulses
+class Wave():
+    def __init__(self, pulses):
+        self.pulses = pulses
+        self.micros = sum(p.delay for p in pulses)
+        # pigpio uses one control block to set, one to clear and one to delay, if any
+        self.cbs = sum((p.gpio_on != 0) + (p.gpio_off != 0) + (p.delay != 0) for p in pulses)
+
+# Stand-in of pigpio.pi
+class pi():
+    # Constructor
+    # If realtime is True, wave_tx_busy() reports busy until the airtime of the last wavechain has elapsed.
+    def __init__(self, host = 'localhost', port = 8888, realtime = False):
+        self.connected = True
+        self.realtime = realtime
+        self.modes = {}
+        self.levels = {}
+        self.waves = {}
+        self.chains = []
+        self.commands = 0       # Number of commands sent to pigpiod
+        self.round_trips = 0    # Number of times waited for pigpiod, once per method call or per write to the socket
+        self.airtime = 0        # [microsec], total airtime of all the wavechains sent
+        self.chain_cbs = 0      # Number of control blocks of the last wavechain sent
+        self.__pending = []
+        self.__last = None
+        self.__next_id = 0
+        self.__tx_end = 0.0
+        self.__callbacks = []
+        self.watchdogs = {}
+        self.__pipelined = False
+        self.sl = _socklock(self)
+        instances.append(self)
+
+    # Count a command, a round trip unless written to the socket
+    def _command(self):
+        self.commands += 1
+        if not self.__pipelined:
+            self.round_trips += 1
+            if RTT: time.sleep(RTT)
+
+    # Execute the commands written to the socket, returning their responses
+    def _execute(self, data):
+        responses = bytearray()
+        i = 0
+        self.__pipelined = True
+        try:
+            while i < len(data):
+                cmd, p1, p2, p3 = struct.unpack_from('<IIII', data, i)
+                ext = data[i + 16:i + 16 + p3]
+                i += 16 + p3
+                try:
+                    if cmd == 0:
+                        res = self.set_mode(p1, p2) or 0
+                    elif cmd == 27:
+                        res = self.wave_clear() or 0
+                    elif cmd == 28:
+                        res = self.wave_add_generic([pulse(*struct.unpack_from('<III', ext, k)) for k in range(0, p3, 12)])
+                    elif cmd == 49:
+                        res = self.wave_create()
+                    elif cmd == 93:
+                        res = self.wave_chain(list(ext))
+                    elif cmd == 32:
+                        res = self.wave_tx_busy()
+                    else:
+                        raise error(f'command {cmd} not supported')
+                except error as e:
+                    if DEBUG: print(f'Command {cmd} failed: {e}')
+                    res = -1    # pigpiod reports errors as negative results
+                responses.extend(struct.pack('<IIII', cmd, p1, p2, res & 0xffffffff))
+        finally:
+            self.__pipelined = False
+        return responses
+
+    # Release, nothing to do
+    def stop(self):
+        self._command()
+        self.connected = False
+
+    def set_mode(self, gpio, mode):
+        self._command()
+        self.modes[gpio] = mode
+
+    def get_mode(self, gpio):
+        self._command()
+        return self.modes.get(gpio, INPUT)
+
+    def write(self, gpio, level):
+        self._command()
+        self.levels[gpio] = level
+
+    def read(self, gpio):
+        self._command()
+        return self.levels.get(gpio, 0)
+
+    def get_current_tick(self):
+        self._command()
+        return int(time.monotonic() * 1e6) & 0xffffffff
+
+    # Callbacks on GPIO edges, called by inject() instead of pigpiod notifications
+    def callback(self, user_gpio, edge = RISING_EDGE, func = None):
+        self._command()
+        cb = _callback(self, user_gpio, edge, func)
+        self.__callbacks.append(cb)
+        return cb
+
+    def set_watchdog(self, user_gpio, wdog_timeout):
+        self._command()
+        self.watchdogs[user_gpio] = wdog_timeout
+
+    # Inject an edge, or a watchdog timeout with level TIMEOUT, as if pigpiod had reported it
+    def inject(self, gpio, level, tick):
+        if level != TIMEOUT:
+            self.levels[gpio] = level
+        for cb in list(self.__callbacks):
+            if cb.gpio == gpio and (level == TIMEOUT or cb.edge == EITHER_EDGE or cb.edge == RISING_EDGE and level == 1 or cb.edge == FALLING_EDGE and level == 0):
+                cb.func(gpio, level, tick & 0xffffffff)
+
+    def _cancel(self, cb):
+        if cb in self.__callbacks:
+            self.__callbacks.remove(cb)
+
+    # Waveforms
+    def wave_clear(self):
+        self._command()
+        self.waves = {}
+        self.__pending = []
+        self.__next_id = 0
+
+    def wave_add_new(self):
+        self._command()
+        self.__pending = []
+
+    def wave_add_generic(self, pulses):
+        self._command()
+        if len(self.__pending) + len(pulses) > MAX_PULSES:
+            raise error('attempt to create a wave with too many pulses')
+        self.__pending.extend(pulses)
+        return len(self.__pending)
+
+    def wave_create(self):
+        self._command()
+        wave = Wave(self.__pending)
+        if sum(w.cbs for w in self.waves.values()) + wave.cbs > MAX_CBS:
+            raise error('no more control blocks')
+        wave_id = self.__next_id
+        self.__next_id += 1
+        self.waves[wave_id] = wave
+        self.__last = wave
+        self.__pending = []
+        if DEBUG: print(f'Wave {wave_id} created, {len(wave.pulses)} pulses, {wave.cbs} CBs, {wave.micros} us')
+        return wave_id
+
+    def wave_delete(self, wave_id):
+        self._command()
+        del self.waves[wave_id]
+
+    def wave_send_once(self, wave_id):
+        return self.wave_chain([wave_id])
+
+    # Send a wavechain; loop and delay commands (255, x) of pigpio are not supported.
+    def wave_chain(self, data):
+        self._command()
+        if len(data) > MAX_CHAIN_BYTES:
+            raise error('chain is too long')
+        micros = 0
+        cbs = 0
+        for wave_id in data:
+            if wave_id not in self.waves:
+                raise error(f'unknown wave id {wave_id}')
+            micros += self.waves[wave_id].micros
+            cbs += 1    # One control block to link each wave in the chain
+        self.chains.append(list(data))
+        self.airtime += micros
+        self.chain_cbs = cbs
+        self.__tx_end = time.monotonic() + micros / 1e6
+        if DEBUG: print(f'Wavechain of {len(data)} waves sent, {micros} us')
+        return 0
+
+    def wave_tx_busy(self):
+        self._command()
+        return 1 if self.realtime and time.monotonic() < self.__tx_end else 0
+
+    def wave_tx_stop(self):
+        self._command()
+        self.__tx_end = 0.0
+
+    # Statistics of the last wave created, and limits
+    def wave_get_micros(self):
+        return self.__last.micros if self.__last else 0
+
+    def wave_get_pulses(self):
+        return len(self.__last.pulses) if self.__last else 0
+
+    def wave_get_cbs(self):
+        return self.__last.cbs if self.__last else 0
+
+    def wave_get_max_micros(self):
+        return MAX_MICROS
+
+    def wave_get_max_pulses(self):
+        return MAX_PULSES
+
+    def wave_get_max_cbs(self):
+        return MAX_CBS
+
+    # Airtime of a wavechain, in microseconds
+    def chain_micros(self, data):
+        return sum(self.waves[wave_id].micros for wave_id in data)
+
+# Register this module as pigpio, so that modules importing pigpio get the stand-in
+def install():
+    sys.modules['pigpio'] = sys.modules[__name__]
@@ -14,11 +14,19 @@ DEBUG = False
 class IRACPanasonic():
     # Class variables
     FRAME_1 = '0220e00400000006'    # First frame
+    MODES = ['heating', 'cooling', 'drying']
+    TEMPS = range(16, 31)
+
+    DEVICE = 'acPanasonic'          # Name in codebooks and state stores
 
     # Constructor
-    def __init__(self, ir):
+    # If a compiled codebook is given, commands are taken from it instead of being encoded on every call.
+    # If a state store is given, the last-transmitted status is shared with other processes and restarts.
+    def __init__(self, ir, codebook = None, store = None):
         # Define IR remote controler handler
         self.__ir = ir
+        self.__codebook = codebook
+        self.__store = store
 
         # Define default status
         # Heating in January, February, March, April, November, and December, by default
@@ -34,12 +42,90 @@ class IRACPanasonic():
         self.__louver = 15
         self.__wind = 'auto'
 
+        # Restore the last-transmitted status, if stored
+        if self.__store is not None:
+            _, state = self.__store.get(IRACPanasonic.DEVICE)
+            if state is not None:
+                self.__load(state)
+
         if DEBUG:
             print(f'Mode: {self.__mode}')
             print(f'Temperature: {self.__temp} degree Celcius')
             print(f'Louver: {self.__louver}')
             print(f'Wind velocity: {self.__wind}')
 
+    # Get all the commands as a dictionary of hexadecimal strings, e.g., for codebooks
+    # Commands are named as 'mode.temp.power', e.g., 'heating.21.on', with the default wind and louver settings.
+    @classmethod
+    def codes(cls):
+        ac = cls(None)
+        codes = {}
+        for mode in cls.MODES:
+            for temp in cls.TEMPS:
+                for power in [True, False]:
+                    ac.__mode = mode
+                    ac.__temp = temp
+                    ac.__power = power
+                    codes[ac.__key()] = cls.FRAME_1 + '++' + ac.__encode()
+        return codes
+
+    # Get the last-transmitted status as a dictionary, as stored if there is a state store
+    def get_state(self):
+        if self.__store is not None:
+            _, state = self.__store.get(IRACPanasonic.DEVICE)
+            if state is not None:
+                self.__load(state)
+        return self.__state()
+
+    def __state(self):
+        return {'power': self.__power, 'mode': self.__mode, 'temp': self.__temp, 'louver': self.__louver, 'wind': self.__wind}
+
+    def __load(self, state):
+        self.__power = state['power']
+        self.__mode = state['mode']
+        self.__temp = state['temp']
+        self.__louver = state['louver']
+        self.__wind = state['wind']
+
+    # Set status and send the command
+    # With a state store, the change is applied on the latest stored status, sent, and then committed by compare-and-set,
+    # so that the store only holds states actually transmitted.
+    # If another process has changed the status in the meantime, the command is encoded on the new status and sent again.
+    def __set(self, mode = None, power = None, temp = None):
+        while True:
+            version = 0
+            if self.__store is not None:
+                version, state = self.__store.get(IRACPanasonic.DEVICE)
+                if state is not None:
+                    self.__load(state)
+            last = self.__state()
+            if mode is not None:
+                self.__mode = mode
+            if power is not None:
+                self.__power = power
+            if temp is not None:
+                self.__temp = temp
+
+            # Keep the last-transmitted status if the command could not be sent
+            try:
+                self.__command()
+            except Exception:
+                self.__load(last)
+                raise
+
+            if self.__store is None or self.__store.compare_and_set(IRACPanasonic.DEVICE, version, self.__state()):
+                return
+            if DEBUG: print('Status changed by another process, sending again...')
+
+    # Check the temperature setting, before anything is changed or sent
+    def __check_temp(self, temp):
+        if temp not in IRACPanasonic.TEMPS:
+            raise ValueError(f'Temperature out of range. Choose between {IRACPanasonic.TEMPS[0]} and {IRACPanasonic.TEMPS[-1]}.')
+
+    # Name of the command in codebooks for the current status
+    def __key(self):
+        return f'{self.__mode}.{self.__temp}.{"on" if self.__power else "off"}'
+
     # Encode
     def __encode(self):
         # Second frame, first 5 bytes
@@ -105,7 +191,15 @@ class IRACPanasonic():
         return frame_2
 
     # Send the command
-    def __command(self, frame_2):
+    def __command(self):
+        # Take the command from the codebook if any, with the default wind and louver settings
+        if self.__codebook is not None and self.__wind == 'auto' and self.__louver == 15:
+            entry = self.__codebook.lookup(IRACPanasonic.DEVICE, self.__key())
+            self.__ir.send_chain(entry.chain, entry.protocol)
+            return
+
+        # Encode second frame
+        frame_2 = self.__encode()
 
         if DEBUG:
             print(f'1st frame: {IRACPanasonic.FRAME_1}')
@@ -119,10 +213,11 @@ class IRACPanasonic():
 
     # Turn on in heating mode:
     def on_heating(self, temp):
-        # Set status
-        self.__mode = 'heating'
-        self.__power = True
-        self.__temp = temp
+        # Check temperature setting
+        self.__check_temp(temp)
+
+        # Set status and send command
+        self.__set(mode = 'heating', power = True, temp = temp)
 
         # For debugging, confirm status
         if DEBUG:
@@ -131,18 +226,13 @@ class IRACPanasonic():
             print(f'Louver: {self.__louver}')
             print(f'Wind velocity: {self.__wind}')
 
-        # Encode frame
-        frame_2 = self.__encode()
-
-        # Send command
-        self.__command(frame_2)
-
     # Turn on in cooling mode:
     def on_cooling(self, temp):
-        # Set status
-        self.__mode = 'cooling'
-        self.__power = True
-        self.__temp = temp
+        # Check temperature setting
+        self.__check_temp(temp)
+
+        # Set status and send command
+        self.__set(mode = 'cooling', power = True, temp = temp)
 
         # For debugging, confirm status
         if DEBUG:
@@ -151,18 +241,13 @@ class IRACPanasonic():
             print(f'Louver: {self.__louver}')
             print(f'Wind velocity: {self.__wind}')
 
-        # Encode frame
-        frame_2 = self.__encode()
-
-        # Send command
-        self.__command(frame_2)
-
     # Turn on in drying mode:
     def on_drying(self, temp):
-        # Set status
-        self.__mode = 'drying'
-        self.__power = True
-        self.__temp = temp
+        # Check temperature setting
+        self.__check_temp(temp)
+
+        # Set status and send command
+        self.__set(mode = 'drying', power = True, temp = temp)
 
         # For debugging, confirm status
         if DEBUG:
@@ -171,15 +256,10 @@ class IRACPanasonic():
             print(f'Louver: {self.__louver}')
             print(f'Wind velocity: {self.__wind}')
 
-        # Encode second frame
-        frame_2 = self.__encode()
-
-        # Send command
-        self.__command(frame_2)
-
     # Turn off
     def off(self):
-        self.__power = False
+        # Set status and send command
+        self.__set(power = False)
 
         # For debugging, confirm status
         if DEBUG:
@@ -188,12 +268,6 @@ class IRACPanasonic():
             print(f'Louver: {self.__louver}')
             print(f'Wind velocity: {self.__wind}')
 
-        # Encode second frame
-        frame_2 = self.__encode()
-
-        # Send command
-        self.__command(frame_2)
-
 # The main function, for testing
 def main():
     # Define the IRxmit handler, LEDs connected to GPIO13 through MOSFET, AEHA format
@@ -0,0 +1,398 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# irdaemon.py - A single transmitter daemon owning the pigpio connection and all the devices
+# (c) 2021 @RR_Inyo
+# Released under the MIT license.
+# https://opensource.org/licenses/mit-license.php
+
+# Web workers must not create their own IRxmit, since each one clears and synthesizes waves on the same pigpiod.
+# Instead, this daemon owns the devices and executes method calls received over a Unix domain socket,
+# one batch at a time, so that transmissions from any number of workers are serialized.
+#
+# Usage:
+#   python3 lib/irdaemon.py [--socket /tmp/remoteir.sock] [--codebook codebook.bin] [--thermostat heating:21]
+#
+# The thermostat, if any, runs in this daemon rather than in each web worker, so that its commands are sent once.
+# With --metrics, the transmitter is timed in this daemon, and its metrics are rendered by the device 'metrics'
+# for /metrics of the web app.
+#
+# Protocol, all integers little-endian:
+# - Message: length of the payload (u32), payload
+# - Request payload: opcode (u8, OP_CALL), number of calls (u16), calls
+#   Call: device name length (u8), method name length (u8), number of arguments (u8), device name, method name, arguments
+# - Reply payload: number of results (u16), results
+#   Result: status (u8), return value
+# - Values are tagged: 'n' None, 'i' int (i32), 'd' float (f64), 's' string (u16 length, UTF-8), 'b' bool (u8),
+#   'm' dictionary of strings to values (u16 number of items, then a string and a value for each)
+#   Other return values are reported as errors.
+
+import os
+import socket
+import socketserver
+import struct
+import threading
+
+# For debugging
+DEBUG = False
+
+SOCKET = '/tmp/remoteir.sock'
+TIMEOUT = 10    # [s], longest wait of a client for the daemon, e.g., serving the other clients
+
+# Opcodes
+OP_CALL = 1
+
+# Status of each call
+OK = 0
+UNKNOWN = 1
+ERROR = 2
+
+# Exception of the client
+class IRDaemonError(Exception):
+    pass
+
+# Encode a value with its tag
+def pack_value(v):
+    if v is None:
+        return b'n'
+    if isinstance(v, bool):
+        return b'b' + struct.pack('<B', v)
+    if isinstance(v, int):
+        return b'i' + struct.pack('<i', v)
+    if isinstance(v, float):
+        return b'd' + struct.pack('<d', v)
+    if isinstance(v, str):
+        b = v.encode()
+        return b's' + struct.pack('<H', len(b)) + b
+    if isinstance(v, dict):
+        return b'm' + struct.pack('<H', len(v)) + b''.join(pack_value(str(k)) + pack_value(x) for k, x in v.items())
+    raise TypeError(f'Unsupported type {type(v)}')
+
+# Decode a tagged value at offset, returning the value and the next offset
+def unpack_value(buf, off):
+    tag = buf[off: off + 1]
+    off += 1
+    if tag == b'n':
+        return None, off
+    if tag == b'b':
+        return bool(buf[off]), off + 1
+    if tag == b'i':
+        return struct.unpack_from('<i', buf, off)[0], off + 4
+    if tag == b'd':
+        return struct.unpack_from('<d', buf, off)[0], off + 8
+    if tag == b's':
+        n = struct.unpack_from('<H', buf, off)[0]
+        return bytes(buf[off + 2: off + 2 + n]).decode(), off + 2 + n
+    if tag == b'm':
+        n = struct.unpack_from('<H', buf, off)[0]
+        off += 2
+        v = {}
+        for i in range(0, n):
+            k, off = unpack_value(buf, off)
+            v[k], off = unpack_value(buf, off)
+        return v, off
+    raise ValueError(f'Unknown tag {tag}')
+
+# Encode a batch of calls, each as (device, method, args)
+def pack_calls(calls):
+    payload = bytearray(struct.pack('<BH', OP_CALL, len(calls)))
+    for device, method, args in calls:
+        d = device.encode()
+        m = method.encode()
+        payload += struct.pack('<BBB', len(d), len(m), len(args)) + d + m
+        for a in args:
+            payload += pack_value(a)
+    return payload
+
+# Decode a batch of calls
+def unpack_calls(payload):
+    op, n = struct.unpack_from('<BH', payload, 0)
+    if op != OP_CALL:
+        raise ValueError(f'Unknown opcode {op}')
+    off = 3
+    calls = []
+    for i in range(0, n):
+        nd, nm, na = struct.unpack_from('<BBB', payload, off)
+        off += 3
+        device = bytes(payload[off: off + nd]).decode()
+        off += nd
+        method = bytes(payload[off: off + nm]).decode()
+        off += nm
+        args = []
+        for j in range(0, na):
+            a, off = unpack_value(payload, off)
+            args.append(a)
+        calls.append((device, method, args))
+    return calls
+
+# Send a message with its length
+def send_message(sock, payload):
+    sock.sendall(struct.pack('<I', len(payload)) + payload)
+
+# Receive a message, or None if the connection is closed
+def recv_message(sock):
+    header = recv_exact(sock, 4)
+    if header is None:
+        return None
+    return recv_exact(sock, struct.unpack('<I', header)[0])
+
+def recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return buf
+
+# Handler of a client connection
+class Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            payload = recv_message(self.request)
+            if payload is None:
+                return
+            results = self.server.daemon.execute(unpack_calls(payload))
+            reply = bytearray(struct.pack('<H', len(results)))
+            for status, v in results:
+                try:
+                    value = pack_value(v)
+                except TypeError as e:
+                    status, value = ERROR, pack_value(str(e))
+                reply += struct.pack('<B', status) + value
+            send_message(self.request, reply)
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+# Class of transmitter daemon
+class IRDaemon():
+    # Constructor
+    # devices: dictionary of device name to object, e.g., {'ac': IRACPanasonic(ir)}
+    def __init__(self, devices, path = SOCKET):
+        self.__devices = devices
+        self.__path = path
+        self.__lock = threading.Lock()
+
+        # Remove the socket left by a previous daemon, failing if the daemon still listens on it,
+        # as two daemons would clear the waves of each other
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except OSError:
+                os.unlink(path)
+            else:
+                raise FileExistsError(f'Socket {path} is used by another transmitter daemon. '
+                                      f'Stop it first, or remove {path} if no daemon is running.')
+            finally:
+                probe.close()
+        self.__server = Server(path, Handler)
+        self.__server.daemon = self
+        os.chmod(path, 0o660)
+
+    # Execute a batch of calls, serialized with the batches of all the other clients
+    def execute(self, calls):
+        results = []
+        with self.__lock:
+            for device, method, args in calls:
+                obj = self.__devices.get(device)
+                if obj is None or method.startswith('_') or not callable(getattr(obj, method, None)):
+                    results.append((UNKNOWN, None))
+                    continue
+                try:
+                    results.append((OK, getattr(obj, method)(*args)))
+                except Exception as e:
+                    if DEBUG: print(f'{device}.{method}{tuple(args)} failed: {e}')
+                    results.append((ERROR, str(e)))
+        return results
+
+    # Call a method of a device in this process, serialized with the calls of the clients, e.g., by the thermostat
+    # The daemon can therefore stand for a client of DeviceProxy.
+    def call(self, device, method, *args):
+        status, v = self.execute([(device, method, args)])[0]
+        if status == UNKNOWN:
+            raise IRDaemonError(f'Unknown device or method {device}.{method}')
+        if status == ERROR:
+            raise IRDaemonError(f'{device}.{method} failed: {v}')
+        return v
+
+    # Serve until shutdown() is called
+    def serve_forever(self):
+        if DEBUG: print(f'Serving on {self.__path}...')
+        self.__server.serve_forever()
+
+    def shutdown(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+        os.unlink(self.__path)
+
+# Class of client, shared by the threads of a web worker
+class IRClient():
+    # Constructor
+    def __init__(self, path = SOCKET, timeout = TIMEOUT):
+        self.__path = path
+        self.__timeout = timeout
+        self.__sock = None
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+
+    # Get a proxy of a device, whose method calls are executed by the daemon
+    def device(self, name):
+        return DeviceProxy(self, name)
+
+    # Execute calls in a single round trip, returning their values
+    # Only connecting and sending are retried: once the request is written, the daemon may have sent the commands,
+    # which must not be sent twice, and a failure is raised.
+    def execute(self, calls):
+        payload = pack_calls(calls)
+        with self.__lock:
+            for retry in [True, False]:
+                try:
+                    if self.__sock is None:
+                        self.__sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                        self.__sock.settimeout(self.__timeout)
+                        self.__sock.connect(self.__path)
+                    send_message(self.__sock, payload)
+                    break
+                except OSError:
+                    # Reconnect once, e.g., after the daemon restarted
+                    self.__close()
+                    if not retry:
+                        raise
+
+            # Drop the connection on any failure, as a late reply would be taken for that of the next request
+            try:
+                reply = recv_message(self.__sock)
+            except OSError:
+                self.__close()
+                raise
+            if reply is None:
+                self.__close()
+                raise ConnectionError('Connection closed by the daemon')
+
+        off = 2
+        values = []
+        for (device, method, args) in calls:
+            status = reply[off]
+            v, off = unpack_value(reply, off + 1)
+            if status == UNKNOWN:
+                raise IRDaemonError(f'Unknown device or method {device}.{method}')
+            if status == ERROR:
+                raise IRDaemonError(f'{device}.{method} failed: {v}')
+            values.append(v)
+        return values
+
+    def __close(self):
+        if self.__sock is not None:
+            self.__sock.close()
+            self.__sock = None
+
+    # Call a method of a device, or queue it if in a batch
+    def call(self, device, method, *args):
+        pending = getattr(self.__local, 'pending', None)
+        if pending is not None:
+            pending.append((device, method, args))
+            return None
+        return self.execute([(device, method, args)])[0]
+
+    # Context manager to send the calls in its block as a single batch
+    def batch(self):
+        return Batch(self, self.__local)
+
+# Batch of calls of a client
+class Batch():
+    def __init__(self, client, local):
+        self.__client = client
+        self.__local = local
+
+    def __enter__(self):
+        self.__local.pending = []
+        return self
+
+    def __exit__(self, exc_type, *args):
+        pending = self.__local.pending
+        self.__local.pending = None
+        if exc_type is None and pending:
+            self.__client.execute(pending)
+        return False
+
+# Proxy of a device owned by the daemon
+class DeviceProxy():
+    def __init__(self, client, name):
+        self.__client = client
+        self.__name = name
+
+    def __getattr__(self, method):
+        if method.startswith('_'):
+            raise AttributeError(method)
+        return lambda *args: self.__client.call(self.__name, method, *args)
+
+# The main function, the daemon
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'Transmitter daemon of Remoteir.')
+    parser.add_argument('--socket', default = SOCKET, help = 'path to the Unix domain socket')
+    parser.add_argument('--host', default = 'localhost', help = 'host running pigpiod')
+    parser.add_argument('--pin', type = int, default = 13, help = 'GPIO pin connected to the IR LEDs')
+    parser.add_argument('--carrier', type = float, default = 38000, help = 'carrier frequency in Hz')
+    parser.add_argument('--duty', type = float, default = 0.5, help = 'duty cycle of the carrier')
+    parser.add_argument('--codebook', help = 'compiled codebook of commands')
+    parser.add_argument('--state', help = 'state store of the devices')
+    parser.add_argument('--thermostat', help = 'thermostat control of the air conditioner as mode:target, e.g., heating:21')
+    parser.add_argument('--hysteresis', type = float, default = 0.5, help = 'hysteresis of the thermostat in degrees Celsius')
+    parser.add_argument('--interval', type = float, default = 60, help = 'interval of the thermostat in seconds')
+    parser.add_argument('--csv', default = '/tmp/DHT22_record.csv', help = 'log file of the DHT22 read by the thermostat')
+    parser.add_argument('--shm', help = 'shared memory of a DHT22 sampler read by the thermostat instead of the log file')
+    parser.add_argument('--metrics', action = 'store_true', help = 'time the transmitter for /metrics of the web app')
+    args = parser.parse_args()
+
+    # Enable metrics, if requested, before the waves are synthesized
+    if args.metrics:
+        irxmit.METRICS = metrics.registry
+
+    # Define the devices, as in the web app
+    ir = irxmit.IRxmit(args.pin, host = args.host, format = 'AEHA', carrier = args.carrier, duty = args.duty)
+    cb = codebook.Codebook(args.codebook) if args.codebook else None
+    store = statestore.StateStore(args.state) if args.state else None
+    devices = {
+        'ir': ir,
+        'ac': iracPanasonic.IRACPanasonic(ir, codebook = cb, store = store),
+        'lightDining': irlightPanasonic.IRlightPanasonic(ir, ch = 1, codebook = cb, store = store),
+        'lightLiving': irlightPanasonic.IRlightPanasonic(ir, ch = 2, codebook = cb, store = store),
+    }
+    if args.metrics:
+        devices['metrics'] = metrics.registry
+
+    d = IRDaemon(devices, args.socket)
+
+    # Thermostat, sending commands through the daemon as the clients do
+    sched = None
+    if args.thermostat:
+        mode, target = args.thermostat.split(':')
+        series = envdata.BufferSeries(dht22.SensorBuffer(args.shm)) if args.shm else envdata.CSVSeries(args.csv)
+        thermo = thermostat.Thermostat(DeviceProxy(d, 'ac'), series.latest, mode, int(target), args.hysteresis)
+        sched = scheduler.Scheduler()
+        sched.every(args.interval, thermo.step)
+        sched.start()
+
+    try:
+        d.serve_forever()
+    except KeyboardInterrupt:
+        if sched is not None:
+            sched.stop()
+        d.shutdown()
+
+if __name__ == '__main__':
+    import irxmit
+    import iracPanasonic
+    import irlightPanasonic
+    import codebook
+    import statestore
+    import scheduler
+    import thermostat
+    import envdata
+    import dht22
+    import metrics
+    main()
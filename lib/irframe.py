@@ -0,0 +1,51 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# irframe.py - Encoding of IR remote control frames into bitstreams and chain descriptors
+# (c) 2021 @RR_Inyo
+# Released under the MIT license.
+# https://opensource.org/licenses/mit-license.php
+
+# This module does not need pigpio, so that codebooks can be compiled offline on any host.
+# irxmit.py synthesizes the waveform elements and translates chain descriptors into pigpio wavechains.
+
+# For debugging
+DEBUG = False
+
+# Element codes of a chain descriptor, indexing the waves created by IRxmit
+ELEMENT_LEADER = 0
+ELEMENT_DATA_0 = 1
+ELEMENT_DATA_1 = 2
+ELEMENT_TRAILER = 3
+
+# Protocol IDs, as stored in compiled codebooks
+PROTOCOLS = {'AEHA': 0, 'NEC': 1}
+
+# Function to create LSB-first bitstream
+# Two frames can be connected with a '++' so that a leader pulse will be added therebetween.
+def get_bitstream(s):
+    bits = ''
+    for i in range(0, len(s) // 2):
+        byte = s[i * 2: i * 2 + 2]
+        if byte == '++':
+            bits += '+'
+        else:
+            bits_MSB_first = f'{int(byte, 16):08b}'
+            bits += bits_MSB_first[::-1]
+    if DEBUG: print(f'A bitstream of {bits} obtained...')
+    return bits
+
+# Function to create a chain descriptor, a sequence of element codes, from a bitstream
+# The descriptor is independent of pigpio wave IDs and can therefore be precomputed, e.g., in codebooks.
+def get_chain_descriptor(bits):
+    desc = bytearray([ELEMENT_LEADER])
+    for bit in bits:
+        if bit == '0':
+            desc.append(ELEMENT_DATA_0)
+        if bit == '1':
+            desc.append(ELEMENT_DATA_1)
+        if bit == '+':
+            desc.append(ELEMENT_TRAILER)
+            desc.append(ELEMENT_LEADER)
+    desc.append(ELEMENT_TRAILER)
+    return bytes(desc)
@@ -15,21 +15,36 @@ class lightNEC:
     OFF = '826dbe41'
 
     # Constructor
-    def __init__(self, ir):
+    # If a compiled codebook is given, commands are taken from it instead of the hexadecimal strings above.
+    def __init__(self, ir, codebook = None):
         # Define IR remote control handler
         self.ir = ir
+        self.codebook = codebook
+
+    # Get all the commands as a dictionary of hexadecimal strings, e.g., for codebooks
+    @classmethod
+    def codes(cls):
+        return {'full': cls.FULL, 'night': cls.NIGHT, 'off': cls.OFF}
+
+    # Send a command, from the codebook if any
+    def send(self, command, s):
+        if self.codebook is not None:
+            entry = self.codebook.lookup('lightNEC', command)
+            self.ir.send_chain(entry.chain, entry.protocol)
+        else:
+            self.ir.send(s)
 
     # Turn on light at full brightness
     def full(self):
-        self.ir.send(lightNEC.FULL)
+        self.send('full', lightNEC.FULL)
 
     # Go into night mode
     def night(self):
-        self.ir.send(lightNEC.NIGHT)
+        self.send('night', lightNEC.NIGHT)
 
     # Turn off
     def off(self):
-        self.ir.send(lightNEC.OFF)
+        self.send('off', lightNEC.OFF)
 
 # The main function
 def main():
@@ -19,7 +19,9 @@ class IRlightPanasonic():
     __COOL  = ['2c523990a9', '2c523994ad', '2c523998a1']
 
     # Constructor
-    def __init__(self, ir, ch = 1):
+    # If a compiled codebook is given, commands are taken from it instead of the hexadecimal strings above.
+    # If a state store is given, the last command sent is recorded in it.
+    def __init__(self, ir, ch = 1, codebook = None, store = None):
         # Set channel
         if ch in [1, 2, 3]:
             self.__ch = ch
@@ -30,6 +32,35 @@ class IRlightPanasonic():
         self.__ir = ir
         if DEBUG: print('IR remote controller handler obtained')
 
+        # Define codebook and state store
+        self.__codebook = codebook
+        self.__store = store
+        self.__device = f'lightPanasonic.ch{ch}'
+
+    # Get all the commands of the given channel as a dictionary of hexadecimal strings, e.g., for codebooks
+    @classmethod
+    def codes(cls, ch):
+        return {
+            'on': cls.__ON[ch - 1],
+            'off': cls.__OFF[ch - 1],
+            'full': cls.__FULL[ch - 1],
+            'night': cls.__NIGHT[ch - 1],
+            'high': cls.__HIGH[ch - 1],
+            'low': cls.__LOW[ch - 1],
+            'warm': cls.__WARM[ch - 1],
+            'cool': cls.__COOL[ch - 1],
+        }
+
+    # Send a command, from the codebook if any
+    def __send(self, command, s):
+        if self.__codebook is not None:
+            entry = self.__codebook.lookup(self.__device, command)
+            self.__ir.send_chain(entry.chain, entry.protocol)
+        else:
+            self.__ir.send(s)
+        if self.__store is not None:
+            self.__store.put(self.__device, {'command': command})
+
     
     # Destructor
     def __del__(self):
@@ -38,42 +69,42 @@ class IRlightPanasonic():
     # Turn on
     def on(self):
         if DEBUG: print(f'Turning on, Panasonic ceiling light on channel {self.__ch}')
-        self.__ir.send(IRlightPanasonic.__ON[self.__ch - 1])
+        self.__send('on', IRlightPanasonic.__ON[self.__ch - 1])
 
     # Turn off
     def off(self):
         if DEBUG: print(f'Turning off, Panasonic ceiling light on channel {self.__ch}')
-        self.__ir.send(IRlightPanasonic.__OFF[self.__ch - 1])
+        self.__send('off', IRlightPanasonic.__OFF[self.__ch - 1])
 
     # Turn on at full brightness
     def full(self):
         if DEBUG: print(f'Turning on at full brightness, Panasonic ceiling light on channel {self.__ch}')
-        self.__ir.send(IRlightPanasonic.__FULL[self.__ch - 1])
+        self.__send('full', IRlightPanasonic.__FULL[self.__ch - 1])
 
     # Night mode
     def night(self):
         if DEBUG: print(f'Changing to night mode, Panasonic ceiling light on channel {self.__ch}')
-        self.__ir.send(IRlightPanasonic.__NIGHT[self.__ch - 1])
+        self.__send('night', IRlightPanasonic.__NIGHT[self.__ch - 1])
 
     # Brighter
     def high(self):
         if DEBUG: print(f'Making brigher, Panasonic ceiling light on channel {self.__ch}')
-        self.__ir.send(IRlightPanasonic.__HIGH[self.__ch - 1])
+        self.__send('high', IRlightPanasonic.__HIGH[self.__ch - 1])
 
     # Darker
     def low(self):
         if DEBUG: print(f'Making darker, Panasonic ceiling light on channel {self.__ch}')
-        self.__ir.send(IRlightPanasonic.__LOW[self.__ch - 1])
+        self.__send('low', IRlightPanasonic.__LOW[self.__ch - 1])
 
     # Warmer
     def warm(self):
         if DEBUG: print(f'Making warmer in color, Panasonic ceiling light on channel {self.__ch}')
-        self.__ir.send(IRlightPanasonic.__WARM[self.__ch - 1])
+        self.__send('warm', IRlightPanasonic.__WARM[self.__ch - 1])
 
     # Cooler
     def cool(self):
         if DEBUG: print(f'Making cooler in color, Panasonic ceiling light on channel {self.__ch}')
-        self.__ir.send(IRlightPanasonic.__COOL[self.__ch - 1])
+        self.__send('cool', IRlightPanasonic.__COOL[self.__ch - 1])
 
 # The main function, for testing purposes
 def main():
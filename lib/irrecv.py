@@ -0,0 +1,226 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# irrecv.py - A module to receive and learn IR remote control signal frames
+# (c) 2021 @RR_Inyo
+# Released under the MIT license.
+# https://opensource.org/licenses/mit-license.php
+
+# This program currently supports the AEHA and the NEC formats only.
+#
+# Edges of the demodulated signal from an IR receiver module (e.g., TSOP38238, active low) are reported
+# by pigpio callbacks with tick timestamps, and stored in a preallocated ring buffer.
+# A watchdog on the GPIO pin reports the end of a burst, and a worker thread decodes the burst with numpy
+# into the LSB-first hexadecimal string format accepted by IRxmit.send(), with '++' between frames.
+
+import pigpio
+import numpy as np
+import queue
+import threading
+
+# For debugging
+DEBUG = False
+
+RING_SIZE = 4096    # [edges], size of the ring buffer
+GAP = 20            # [ms], silence ending a burst, longer than the trailer of 8 ms
+LEADER_MIN = 2000   # [microsec], marks longer than this are leaders
+NEC_LEADER_MIN = 6000   # [microsec], leaders longer than this are of the NEC format
+
+# Modulation unit and leader of each format, as transmitted by IRxmit
+# format: (T [microsec], leader 'on' time units, leader 'off' time units)
+TIMING = {
+    'AEHA': (425, 8, 4),
+    'NEC': (562.5, 16, 8),
+}
+
+# Decode a burst of edges into a hexadecimal string, or None if no frame is found
+# levels: level after each edge, ticks: tick of each edge in microseconds (wrapping at 32 bits)
+def decode(levels, ticks, active_low = True):
+    levels = np.asarray(levels, dtype = np.uint8)
+    ticks = np.asarray(ticks, dtype = np.uint32)
+    if len(ticks) < 2:
+        return None
+
+    # Duration of each level, with 32-bit wraparound of ticks
+    d = np.diff(ticks).astype(np.int64)
+    mark = levels[:-1] == (0 if active_low else 1)
+
+    # Start from the first mark, and split into pairs of mark and following space
+    marks = np.flatnonzero(mark)
+    if len(marks) == 0:
+        return None
+    d = d[marks[0]:]
+    m = d[0::2]
+    s = np.full(len(m), np.iinfo(np.int64).max)
+    s[:len(d[1::2])] = d[1::2]
+
+    # Modulation unit of each pair, estimated from the latest leader
+    leader = m > LEADER_MIN
+    if not leader.any():
+        return None
+    units = np.where(m > NEC_LEADER_MIN, 16, 8)
+    latest = np.maximum.accumulate(np.where(leader, np.arange(len(m)), 0))
+    T = m[latest] / units[latest]
+
+    # Classify spaces: T for '0', 3T for '1', and longer for the trailer
+    bit = s > 2 * T
+    trailer = (s > 4 * T) & ~leader
+
+    # Slice the bits of each frame from its leader to its trailer
+    frames = []
+    ends = np.flatnonzero(trailer)
+    for i in np.flatnonzero(leader):
+        j = np.searchsorted(ends, i)
+        if j == len(ends):
+            break
+        bits = bit[i + 1: ends[j]]
+        # Skip repeat codes and truncated frames
+        if len(bits) == 0 or len(bits) % 8 != 0:
+            if DEBUG: print(f'Frame of {len(bits)} bits skipped')
+            continue
+        frames.append(np.packbits(bits.astype(np.uint8), bitorder = 'little').tobytes().hex())
+
+    if not frames:
+        return None
+    return '++'.join(frames)
+
+# Synthesize the edges of a hexadecimal string, as demodulated by an active-low receiver, for replay
+def encode_edges(s, format = 'AEHA', t0 = 0):
+    T, n_on, n_off = TIMING[format]
+    levels, ticks = [], []
+    t = t0
+
+    def pulse(on, off):
+        nonlocal t
+        levels.append(0)
+        ticks.append(round(t) & 0xffffffff)
+        t += on
+        levels.append(1)
+        ticks.append(round(t) & 0xffffffff)
+        t += off
+
+    for i, frame in enumerate(s.split('++')):
+        if i > 0:
+            pulse(T, 8000 - T)
+        pulse(T * n_on, T * n_off)
+        for byte in bytes.fromhex(frame):
+            for k in range(0, 8):
+                pulse(T, T * 3 if byte >> k & 1 else T)
+    pulse(T, 8000 - T)
+    return levels, ticks
+
+# Class of IR receiver
+class IRrecv():
+    # Constructor
+    def __init__(self, pin, host = '127.0.0.1', size = RING_SIZE, gap = GAP, active_low = True):
+        self.__pin = pin
+        self.__active_low = active_low
+
+        # Preallocated ring buffer of edges
+        self.__size = size
+        self.__ticks = np.zeros(size, dtype = np.uint32)
+        self.__levels = np.zeros(size, dtype = np.uint8)
+        self.__head = 0     # Number of edges written
+        self.__tail = 0     # Start of the current burst
+
+        # Bursts to decode, and frames decoded
+        self.__bursts = queue.Queue()
+        self.__frames = queue.Queue()
+        self.__edges = 0
+        self.__dropped = 0
+        self.__decoded = 0
+        self.__errors = 0
+
+        # Decode in a worker thread so that the callback only stores edges
+        self.__worker = threading.Thread(target = self.__decode_bursts, daemon = True)
+        self.__worker.start()
+
+        # Get pigpio handler, and register the callback and the watchdog
+        self.__pi = pigpio.pi(host)
+        self.__pi.set_mode(pin, pigpio.INPUT)
+        self.__pi.set_watchdog(pin, gap)
+        self.__cb = self.__pi.callback(pin, pigpio.EITHER_EDGE, self.__edge)
+        if DEBUG: print(f'IR receiver on GPIO{pin} started...')
+
+    # Destructor
+    def __del__(self):
+        self.close()
+
+    # Stop receiving
+    def close(self):
+        if self.__pi is None:
+            return
+        self.__cb.cancel()
+        self.__pi.set_watchdog(self.__pin, 0)
+        self.__pi.stop()
+        self.__pi = None
+        self.__bursts.put(None)
+
+    # Callback on each edge, and on the watchdog timeout ending a burst
+    def __edge(self, gpio, level, tick):
+        if level == pigpio.TIMEOUT:
+            # Copy the burst out of the ring buffer, so that following bursts cannot overwrite it
+            if self.__head > self.__tail:
+                idx = np.arange(self.__tail, self.__head) % self.__size
+                self.__bursts.put((self.__levels[idx], self.__ticks[idx]))
+                self.__tail = self.__head
+            return
+
+        # Drop the oldest edge of the burst if the ring buffer is full
+        if self.__head - self.__tail >= self.__size:
+            self.__tail += 1
+            self.__dropped += 1
+        i = self.__head % self.__size
+        self.__ticks[i] = tick
+        self.__levels[i] = level
+        self.__head += 1
+        self.__edges += 1
+
+    # Worker thread to decode bursts
+    def __decode_bursts(self):
+        while True:
+            burst = self.__bursts.get()
+            if burst is None:
+                return
+            levels, ticks = burst
+            s = decode(levels, ticks, self.__active_low)
+            if s is None:
+                self.__errors += 1
+            else:
+                self.__decoded += 1
+                self.__frames.put(s)
+            if DEBUG: print(f'Burst of {len(ticks)} edges decoded as {s}')
+
+    # Replay a stream of edges, e.g., synthesized by encode_edges(), followed by the end of the burst
+    def replay(self, levels, ticks):
+        for level, tick in zip(levels, ticks):
+            self.__edge(self.__pin, level, tick)
+        self.__edge(self.__pin, pigpio.TIMEOUT, ticks[-1] if len(ticks) else 0)
+
+    # Get the next received string in the format of IRxmit.send(), or None after timeout
+    def receive(self, timeout = None):
+        try:
+            return self.__frames.get(timeout = timeout)
+        except queue.Empty:
+            return None
+
+    # Get statistics
+    def get_stats(self):
+        return {'edges': self.__edges, 'dropped': self.__dropped, 'decoded': self.__decoded, 'errors': self.__errors}
+
+# The main function, to learn codes from a remote controller
+def main():
+    # IR receiver module connected to GPIO4
+    r = IRrecv(4)
+
+    print('Point a remote controller at the receiver and press buttons, Ctrl-C to quit...')
+    try:
+        while True:
+            s = r.receive()
+            print(s)
+    except KeyboardInterrupt:
+        pass
+    r.close()
+
+if __name__ == '__main__':
+    main()
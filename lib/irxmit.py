@@ -9,37 +9,218 @@
 
 # This program currently supports the AEHA and the NEC formats only.
 
+import functools
 import pigpio
+import struct
+import time
 
 # For debugging
 DEBUG = False
 SINGLE_WAVE = False
 
+# Metrics registry of metrics.py, None to disable instrumentation
+METRICS = None
+
+# Maximum number of wavechains cached per transmitter, keyed by the hexadecimal string sent
+CHAIN_CACHE_SIZE = 256
+
 # Explanation on IR subcarrier and frame synthesis parameters:
 #
 # In the AEHA format, the subcarrier frequency shall be 33-40 kHz (typ. 38 kHz).
 # The modulation unit, T, shall be 0.35-0.50 ms (typ. 0.425 ms).
-# This program lets the carrier frequency be 38.4615 kHz, or the period be 0.026 ms.
-# Making the modulation unit be 17 cycles of the subcarrier leads to T = 0.442 ms.
 # The leader consists of 8T 'on' (mark/light) and 4T 'off' (space/dark).
 #
 # In the NEC format, the subcarrier frequency shall be 38 kHz (I do not know tolerance).
-# The modulation unit, T, shall be 0.562 ms (I do not know the tolerance).
-# This program lets the carrier frequency be 38.4615 kHz, or the period be 0.026 ms.
-# Making the modulation unit, T, be 22 cycles of the subcarrier leads to T = 0.572 ms (longer by 1.7%).
+# The modulation unit, T, shall be 0.5625 ms (I do not know the tolerance).
 # The leader consists of 16T 'on' (mark/light) and 8T 'off' (space/dark).
+#
+# This program uses the typical T of each format, and the carrier frequency and duty cycle given, 38 kHz and 50% by default.
+# As pigpio pulses are whole microseconds, each edge is placed at its exact time rounded to a microsecond,
+# carrying the fraction over to the next pulse, e.g., 13 us and 14 us alternately for the half period of 13.16 us.
+# Rounding errors do not accumulate, so that marks and spaces are within 0.5 us of the nominal timing.
+# The last carrier cycle of a mark is aligned to its end, i.e., its 'off' time ends with the mark,
+# as a receiver sees the mark from the first rising edge to one 'off' time after the last falling edge.
+# If the mark is not a whole number of cycles, the 'off' time before the last cycle is longer by the fraction.
+
+CARRIER = 38000     # [Hz], default carrier frequency
+DUTY = 0.5          # Default duty cycle of the carrier, e.g., 1/3 to reduce the power and heat of the LEDs
+T_TRAILER = 8000    # [microsec], trailer, from its mark to the next frame
+
+# Names of the waveform elements, indexed by element codes
+ELEMENT_NAMES = ('leader', 'data 0', 'data 1', 'trailer')
+
+# Element codes of a chain descriptor, protocol IDs, and encoding of frames, shared with the codebook compiler
+# irframe.py is imported as a module of the lib package, or directly if this module is run as a script.
+try:
+    from lib.irframe import ELEMENT_LEADER, ELEMENT_DATA_0, ELEMENT_DATA_1, ELEMENT_TRAILER, PROTOCOLS, get_bitstream, get_chain_descriptor
+except ImportError:
+    from irframe import ELEMENT_LEADER, ELEMENT_DATA_0, ELEMENT_DATA_1, ELEMENT_TRAILER, PROTOCOLS, get_bitstream, get_chain_descriptor
+
+# Function to synthesize the pulses of a waveform element, a mark of the carrier followed by a space
+# mask: bit mask of the GPIO pin, t_mark, t_total: [microsec], lengths of the mark and of the whole element
+# The pulses only depend on these parameters, and are therefore computed once for all the transmitters.
+@functools.lru_cache(maxsize = None)
+def synthesize_element(mask, t_mark, t_total, carrier = CARRIER, duty = DUTY):
+    period = 1e6 / carrier
+    t_on = period * duty
+
+    # Exact times of the edges and the levels after them, the cycles from the start of the mark, and the last one aligned to its end
+    edges = []
+    k = 0
+    while (k + 2) * period <= t_mark:
+        edges.append((k * period, 1))
+        edges.append((k * period + t_on, 0))
+        k += 1
+    edges.append((max(t_mark - period, 0), 1))
+    edges.append((t_mark - period + t_on, 0))
+    edges.append((t_total, None))
+
+    # Pulses between the edges rounded to microseconds
+    pulses = []
+    for (t0, level), (t1, _) in zip(edges, edges[1:]):
+        delay = round(t1) - round(t0)
+        if delay == 0:
+            continue
+        if level:
+            pulses.append(pigpio.pulse(mask, 0, delay))
+        else:
+            pulses.append(pigpio.pulse(0, mask, delay))
+    return tuple(pulses)
+
+# Function to measure the timing of the pulses of a waveform element against the nominal timing
+# The mark is measured from the first rising edge to the last falling edge plus the 'off' time of a cycle,
+# and the space is the rest of the element.
+# Returns the mark, the space, and their errors in microseconds, the carrier frequency and duty cycle,
+# and the largest drift of the carrier cycles from the nominal frequency in microseconds,
+# the last three over the cycles before the last one, which is aligned to the end of the mark.
+def verify_element(pulses, t_mark, t_total, carrier = CARRIER, duty = DUTY):
+    starts, widths = [], []
+    t = 0
+    for p in pulses:
+        if p.gpio_on:
+            starts.append(t)
+            widths.append(p.delay)
+        t += p.delay
+    mark = starts[-1] + widths[-1] - starts[0] + 1e6 / carrier * (1 - duty)
+    space = t - mark
+
+    # Carrier frequency and duty cycle over the whole cycles, except the last one
+    starts, widths = starts[:-1], widths[:-1]
+    if len(starts) > 1:
+        f = (len(starts) - 1) * 1e6 / (starts[-1] - starts[0])
+        d = sum(widths[:-1]) / (starts[-1] - starts[0])
+    else:
+        f, d = 0, 0
+    drift = max((abs(s - k * 1e6 / carrier) for k, s in enumerate(starts)), default = 0)
+
+    return {
+        'mark': mark, 'mark_error': mark - t_mark,
+        'space': space, 'space_error': space - (t_total - t_mark),
+        'carrier': f, 'duty': d, 'drift': drift,
+    }
+
+# Pipelined transport of pigpio commands:
+#
+# Each method of pigpio.pi sends a command to pigpiod and waits for its response, a round trip on the socket.
+# This matters when pigpiod runs on another host, given by the host argument.
+# A pipeline writes a sequence of commands to the socket at once and then reads all their responses,
+# e.g., wave IDs of waves created, in a single round trip, as pigpiod answers commands in order.
+# Commands are encoded as pigpio does, 16 bytes of command, p1, p2 and p3, followed by p3 bytes of extension.
+# Handlers without the command socket of pigpio.pi fall back to calling the methods one by one.
+
+# Command codes of pigpiod
+CMD_MODES = 0
+CMD_WVCLR = 27
+CMD_WVAG = 28
+CMD_WVBSY = 32
+CMD_WVCRE = 49
+CMD_WVCHA = 93
+
+COMMAND = struct.Struct('<IIII')    # Command, p1, p2, p3; the response has the result in place of p3
+PULSE = struct.Struct('<III')       # gpio_on, gpio_off, delay
+
+# Encoders of the commands supported, returning (command, p1, p2, extension)
+ENCODERS = {
+    'set_mode': lambda gpio, mode: (CMD_MODES, gpio, mode, b''),
+    'wave_clear': lambda: (CMD_WVCLR, 0, 0, b''),
+    'wave_add_generic': lambda pulses: (CMD_WVAG, 0, 0, b''.join(PULSE.pack(p.gpio_on, p.gpio_off, p.delay) for p in pulses)),
+    'wave_create': lambda: (CMD_WVCRE, 0, 0, b''),
+    'wave_chain': lambda data: (CMD_WVCHA, 0, 0, bytes(data)),
+    'wave_tx_busy': lambda: (CMD_WVBSY, 0, 0, b''),
+}
+
+# Encode a call, (method name, arguments...), into the bytes of a command
+def encode(call):
+    cmd, p1, p2, ext = ENCODERS[call[0]](*call[1:])
+    return COMMAND.pack(cmd, p1, p2, len(ext)) + ext
+
+# Class of transport of pigpio commands
+class Transport():
+    # Constructor
+    # pi: pigpio handler
+    def __init__(self, pi):
+        self.pi = pi
+        self.commands = 0       # Number of commands sent
+        self.round_trips = 0    # Number of times waited for pigpiod
+        self.__sl = getattr(pi, 'sl', None)     # Socket and its lock of pigpio.pi, if any
+
+    # Send a command and wait for its result, a round trip
+    def call(self, name, *args):
+        self.commands += 1
+        self.round_trips += 1
+        return getattr(self.pi, name)(*args)
+
+    # Send a sequence of calls, (method name, arguments...), returning their results
+    # A single round trip if the command socket is available; raises pigpio.error after all the responses are read if any failed.
+    def pipeline(self, calls):
+        self.commands += len(calls)
+        if self.__sl is None:
+            self.round_trips += len(calls)
+            return [getattr(self.pi, c[0])(*c[1:]) for c in calls]
+
+        data = b''.join(encode(c) for c in calls)
+        with self.__sl.l:
+            self.__sl.s.sendall(data)
+            responses = self.__recv(COMMAND.size * len(calls))
+        self.round_trips += 1
+        if DEBUG: print(f'{len(calls)} pigpio commands, {len(data)} bytes pipelined')
+
+        results = []
+        for i in range(0, len(calls)):
+            res = COMMAND.unpack_from(responses, COMMAND.size * i)[3]
+            results.append(res - (1 << 32) if res & 0x80000000 else res)
+        for c, res in zip(calls, results):
+            if res < 0:
+                raise pigpio.error(f'{c[0]} failed with error {res}')
+        return results
+
+    # Receive exactly n bytes
+    def __recv(self, n):
+        buf = bytearray()
+        while len(buf) < n:
+            chunk = self.__sl.s.recv(n - len(buf))
+            if not chunk:
+                raise pigpio.error('connection to pigpiod lost')
+            buf.extend(chunk)
+        return bytes(buf)
+
+    # Get statistics of the commands sent
+    def get_stats(self):
+        return {'commands': self.commands, 'round_trips': self.round_trips}
 
 # Class of IR transmitter
 class IRxmit():
     # Constructor
-    def __init__(self, pin, host = '127.0.0.1', format = 'AEHA'):
+    # carrier: [Hz], carrier frequency, duty: duty cycle of the carrier
+    def __init__(self, pin, host = '127.0.0.1', format = 'AEHA', carrier = CARRIER, duty = DUTY):
         # Define private variables for pigpio
         self.__pin = pin
         self.__host = host
 
-        # Get pigpio handler and set GPIO pin connected to IR LED(s) to output
+        # Get pigpio handler and its transport, counting round trips
+        # The GPIO pin connected to IR LED(s) is set to output with the waveform elements in a single round trip.
         self.__pi = pigpio.pi(self.__host)
-        self.__pi.set_mode(self.__pin, pigpio.OUTPUT)
+        self.__transport = Transport(self.__pi)
         if DEBUG:
             print(f'A pigpio handler on {self.__host} obtained...')
             print(f'Maximum possible size of a waveform in DMA control blocks: {self.__pi.wave_get_max_cbs()}')
@@ -49,8 +230,7 @@ class IRxmit():
         # Define IR subcarrier and frame synthesis parameters
         # AEHA format
         if format == 'AEHA':
-            self.__T_CARRIER = 26       # [microsec], carrier period
-            self.__MARK_CYCLES = 17     # [cycles], number of carrier cycles in a mark/light
+            self.__T = 425              # [microsec], modulation unit
             self.__MARK_OFF = 3         # 'Off' (space/dark) time length relative to 'on' (light) length if '1'
             self.__T_FRAME_MAX = 0.13   # [s], expected maximum AEHA-format IR frame length
             self.__N_LEADER_ON = 8      # 'On' (mark/light) time units of the leader
@@ -58,8 +238,7 @@ class IRxmit():
 
         # NEC format
         elif format == 'NEC':
-            self.__T_CARRIER = 26       # [microsec], carrier period
-            self.__MARK_CYCLES = 22     # [cycles], number of carrier cycles in a mark/light
+            self.__T = 562.5            # [microsec], modulation unit
             self.__MARK_OFF = 3         # 'Off' (space/dark) time length relative to 'on' (light) length if '1'
             self.__T_FRAME_MAX = 0.108  # [s], expected maximum AEHA-format IR frame length
             self.__N_LEADER_ON = 16     # 'On' (mark/light) time units of the leader
@@ -70,10 +249,29 @@ class IRxmit():
             raise Exception('Unknown format specified.')
 
         if DEBUG: print(f'{format} format specified...')
+        self.__format = format
+
+        # Define carrier
+        if not 0 < duty < 1:
+            raise ValueError('Duty cycle out of range. Choose between 0 and 1.')
+        # At least a carrier cycle in the shortest mark, T, and 'on' and 'off' times of whole microseconds
+        if not 1e6 / self.__T <= carrier <= 1e6 * min(duty, 1 - duty):
+            raise ValueError(f'Carrier frequency out of range. Choose between {1e6 / self.__T:.0f} and {1e6 * min(duty, 1 - duty):.0f} Hz.')
+        self.__carrier = carrier
+        self.__duty = duty
 
         # Create waveform elements
         self.__synthesize_elements()
 
+        # Cache of wavechains, valid as long as the waveform elements are not cleared
+        self.__chains = {}
+        self.__cache_hits = 0
+        self.__cache_misses = 0
+
+        # Time the last wavechain was submitted, for metrics, and time it is expected to end
+        self.__t_sent = None
+        self.__t_end = 0.0
+
     # Destructor
     def __del__(self):
         # Release the pigpio
@@ -88,63 +286,48 @@ class IRxmit():
         # - Data '1', mark: T, space: 3T
         # - Trailer
 
-        # Clear wave
-        self.__pi.wave_clear()
-
-        # Generate waveform of leader
-        wb = []
-        for i in range(0, self.__MARK_CYCLES * self.__N_LEADER_ON):
-            wb.append(pigpio.pulse(1 << self.__pin, 0, self.__T_CARRIER // 2))
-            wb.append(pigpio.pulse(0, 1 << self.__pin, self.__T_CARRIER // 2))
-        wb.append(pigpio.pulse(0, 1 << self.__pin, self.__T_CARRIER * self.__MARK_CYCLES * self.__N_LEADER_OFF))
-        self.__pi.wave_add_generic(wb)
-        self.__wave_leader = self.__pi.wave_create()
-        if DEBUG: print('Waveform for leader pulses created')
-
-        # Generate waveform of Data '0'
-        wb = []
-        for i in range(0, self.__MARK_CYCLES):
-            wb.append(pigpio.pulse(1 << self.__pin, 0, self.__T_CARRIER // 2))
-            wb.append(pigpio.pulse(0, 1 << self.__pin, self.__T_CARRIER // 2))
-        wb.append(pigpio.pulse(0, 1 << self.__pin, self.__T_CARRIER * self.__MARK_CYCLES))
-        self.__pi.wave_add_generic(wb)
-        self.__wave_data_0 = self.__pi.wave_create()
-        if DEBUG: print('Waveform for data \'0\' created')
-
-        # Generate waveform of Data '1'
-        wb = []
-        for i in range(0, self.__MARK_CYCLES):
-            wb.append(pigpio.pulse(1 << self.__pin, 0, self.__T_CARRIER // 2))
-            wb.append(pigpio.pulse(0, 1 << self.__pin, self.__T_CARRIER // 2))
-        wb.append(pigpio.pulse(0, 1 << self.__pin, self.__T_CARRIER * self.__MARK_CYCLES * self.__MARK_OFF))
-        self.__pi.wave_add_generic(wb)
-        self.__wave_data_1 = self.__pi.wave_create()
-        if DEBUG: print('Waveform for data \'1\' created')
-
-        # Generate waveform of trailer
-        wb = []
-        for i in range(0, self.__MARK_CYCLES):
-            wb.append(pigpio.pulse(1 << self.__pin, 0, self.__T_CARRIER // 2))
-            wb.append(pigpio.pulse(0, 1 << self.__pin, self.__T_CARRIER // 2))
-        wb.append(pigpio.pulse(0, 1 << self.__pin, 8000 - self.__T_CARRIER * self.__MARK_CYCLES))
-        self.__pi.wave_add_generic(wb)
-        self.__wave_trailer = self.__pi.wave_create()
-        if DEBUG: print('Waveform for trailer created')
-
-    # Function to create LSB-first bitstream
+        # Generate pulses of the elements from the carrier and the nominal timing
+        self.__elements = tuple(synthesize_element(1 << self.__pin, t_mark, t_total, self.__carrier, self.__duty)
+                                for t_mark, t_total in self.get_element_timing())
+
+        # Set the pin to output, clear waves, and create the waves in a single round trip
+        calls = [('set_mode', self.__pin, pigpio.OUTPUT), ('wave_clear',)]
+        for wb in self.__elements:
+            calls += [('wave_add_generic', wb), ('wave_create',)]
+
+        # Wave IDs indexed by element codes, to translate chain descriptors into wavechains
+        self.__waves = tuple(self.__transport.pipeline(calls)[3::2])
+        if DEBUG: print(f'Waveforms for {", ".join(ELEMENT_NAMES)} created')
+
+        # Airtime of the waves, to tell when a wavechain is expected to end
+        self.__micros = {w: sum(p.delay for p in wb) for w, wb in zip(self.__waves, self.__elements)}
+
+    # Function to get the nominal timing of the waveform elements, as (mark, total) in microseconds, indexed by element codes
+    def get_element_timing(self):
+        T = self.__T
+        return (
+            (T * self.__N_LEADER_ON, T * (self.__N_LEADER_ON + self.__N_LEADER_OFF)),
+            (T, T * 2),
+            (T, T * (1 + self.__MARK_OFF)),
+            (T, T_TRAILER),
+        )
+
+    # Function to verify the timing of the waveform elements against the nominal timing
+    # Returns a dictionary of element names to the results of verify_element().
+    def verify_timing(self):
+        return {name: verify_element(wb, t_mark, t_total, self.__carrier, self.__duty)
+                for name, wb, (t_mark, t_total) in zip(ELEMENT_NAMES, self.__elements, self.get_element_timing())}
+
+    # Function to create LSB-first bitstream, as irframe.get_bitstream()
     # Two frames can be connected with a '++' so that a leader pulse will be added therebetween in __synthesize() method.
     @classmethod
-    def __get_bitstream(cls, s):
-        bits = ''
-        for i in range(0, len(s) // 2):
-            byte = s[i * 2: i * 2 + 2]
-            if byte == '++':
-                bits += '+'
-            else:
-                bits_MSB_first = f'{int(byte, 16):08b}'
-                bits += bits_MSB_first[::-1]
-        if DEBUG: print(f'A bitstream of {bits} obtained...')
-        return bits
+    def get_bitstream(cls, s):
+        return get_bitstream(s)
+
+    # Function to create a chain descriptor, a sequence of element codes, from a bitstream, as irframe.get_chain_descriptor()
+    @staticmethod
+    def get_chain_descriptor(bits):
+        return get_chain_descriptor(bits)
 
     # Function to synthesize the AEHA-format IR frame as a single pigpio waveform
     # CAUTION: This method is obsolete and results in an error if the number of pulse objects exceeds 5,460.
@@ -153,35 +336,19 @@ class IRxmit():
         wb = []
 
         # Synthesize the leader pulses, mark: 8T, space: 4T
-        # Mark, with the 38-kHz carrier
-        for i in range(0, self.__MARK_CYCLES * self.__N_LEADER_ON):
-            wb.append(pigpio.pulse(1 << self.__pin, 0, self.__T_CARRIER // 2))
-            wb.append(pigpio.pulse(0, 1 << self.__pin,  self.__T_CARRIER // 2))
-        # Space
-        wb.append(pigpio.pulse(0, 1 << self.__pin, self.__T_CARRIER * self.__MARK_CYCLES * self.__N_LEADER_OFF))
+        wb.extend(self.__elements[ELEMENT_LEADER])
         if DEBUG: print ('A pigpio waveform of leader pulses synthesized...')
 
-        # Synthesize the data pulses
+        # Synthesize the data pulses, mark: T, space: T if bit is '0', or 3T if bit is '1'
         for bit in bits:
-            # Mark, for T, with the 38-kHz carrier
-            for i in range(0, self.__MARK_CYCLES):
-                wb.append(pigpio.pulse(1 << self.__pin, 0, self.__T_CARRIER // 2))
-                wb.append(pigpio.pulse(0, 1 << self.__pin, self.__T_CARRIER // 2))
-            # Space, for T if bit is '0'
             if bit == '0':
-                wb.append(pigpio.pulse(0, 1 << self.__pin, self.__T_CARRIER * self.__MARK_CYCLES))
-            # Space, for 3T if bit is '1'
+                wb.extend(self.__elements[ELEMENT_DATA_0])
             elif bit == '1':
-                wb.append(pigpio.pulse(0, 1 << self.__pin, self.__T_CARRIER * self.__MARK_CYCLES * self.__MARK_OFF))
+                wb.extend(self.__elements[ELEMENT_DATA_1])
         if DEBUG: print ('A pigpio waveform of data pulses synthesized...')
 
-        # Synthesize the trailer
-        # Mark, for T, with the 38-kHz carrier
-        for i in range(0, self.__MARK_CYCLES):
-            wb.append(pigpio.pulse(1 << self.__pin, 0, self.__T_CARRIER // 2))
-            wb.append(pigpio.pulse(0, 1 << self.__pin, self.__T_CARRIER // 2))
-        # Space, for 8 ms - T
-        wb.append(pigpio.pulse(0, 1 << self.__pin, 8000 - self.__T_CARRIER * self.__MARK_CYCLES))
+        # Synthesize the trailer, mark: T, space: 8 ms - T
+        wb.extend(self.__elements[ELEMENT_TRAILER])
         if DEBUG:
             print('A pigpio waveform of trailer pulses synthesized...')
 
@@ -200,47 +367,90 @@ class IRxmit():
         return wc
 
     # Function to synthesize frame as a wavechain consisting of wave elements created in __synthesize_elements() method
+    # If there is a '+' in the input string, a trailer and a leader pulse is added to directly connect frames.
     def __synthesize(self, bits):
-        # Create empty wavechain
-        wc = []
-
-        # Append leader
-        wc.append(self.__wave_leader)
+        return self.__translate(self.get_chain_descriptor(bits))
 
-        # Append data
-        # If there is a '+' in the input string, a trailer and a leader pulse is added to directly connect frames.
-        for bit in bits:
-            if bit == '0':
-                wc.append(self.__wave_data_0)
-            if bit == '1':
-                wc.append(self.__wave_data_1)
-            if bit == '+':
-                wc.append(self.__wave_trailer)
-                wc.append(self.__wave_leader)
-
-        # Append trailer
-        wc.append(self.__wave_trailer)
+    # Function to translate a chain descriptor into a wavechain of wave IDs
+    def __translate(self, desc):
+        wc = [self.__waves[e] for e in desc]
         if DEBUG: print(f'Wavechain generated {wc}')
-
         return wc
 
     # Function to send an AEHA-format IR signal
     def send(self, s):
-        if DEBUG: print(f'Creating a bitstream from the hexadecimal string data {s}...')
-        bits = self.__get_bitstream(s)
-
         if SINGLE_WAVE:
+            if DEBUG: print(f'Creating a bitstream from the hexadecimal string data {s}...')
+            bits = self.get_bitstream(s)
             if DEBUG: print('Synthesizing the frame as a single wave...')
             wc = self.__synthesize_single(bits)
         else:
-            if DEBUG: print('Synthesizing the frame as a wavechain with mutiple waves...')
-            wc = self.__synthesize(bits)
+            wc = self.__chains.get(s)
+            if wc is None:
+                self.__cache_misses += 1
+                if DEBUG: print(f'Creating a bitstream from the hexadecimal string data {s}...')
+                if METRICS: t0 = time.perf_counter()
+                bits = self.get_bitstream(s)
+                if METRICS: t1 = time.perf_counter()
+                if DEBUG: print('Synthesizing the frame as a wavechain with mutiple waves...')
+                wc = self.__synthesize(bits)
+                if METRICS:
+                    METRICS.observe('remoteir_ir_encode_seconds', t1 - t0)
+                    METRICS.observe('remoteir_ir_synthesis_seconds', time.perf_counter() - t1)
+                if len(self.__chains) >= CHAIN_CACHE_SIZE:
+                    self.__chains.clear()
+                self.__chains[s] = wc
+            else:
+                self.__cache_hits += 1
+                if DEBUG: print(f'Wavechain for {s} found in cache {wc}')
+
+        self.__chain(wc)
 
+    # Function to send a precompiled chain descriptor, e.g., an entry of a codebook
+    # The protocol ID of the entry, if given, must be that of the format of this transmitter.
+    def send_chain(self, desc, protocol = None):
+        if protocol is not None and protocol != PROTOCOLS[self.__format]:
+            raise ValueError(f'Chain of protocol {protocol} cannot be sent in the {self.__format} format.')
+        self.__chain(self.__translate(desc))
+
+    # Function to submit a wavechain to pigpiod
+    def __chain(self, wc):
         if DEBUG: print(f'Sending the pigpio wavechain on GPIO{self.__pin} pin...')
-        self.__pi.wave_chain(wc)
+        if METRICS:
+            t0 = time.perf_counter()
+            self.__transport.call('wave_chain', wc)
+            self.__t_sent = time.perf_counter()
+            METRICS.observe('remoteir_ir_wave_chain_seconds', self.__t_sent - t0)
+        else:
+            self.__transport.call('wave_chain', wc)
+        self.__t_end = time.monotonic() + sum(self.__micros[w] for w in wc) / 1e6
 
     def is_busy(self):
-        return self.__pi.wave_tx_busy()
+        return self.__transport.call('wave_tx_busy')
+
+    # Wait until the transmission completes, for at least t_min seconds in total
+    # The airtime expected is slept through first, so that pigpiod is polled about once.
+    def wait_idle(self, t_min = 0, interval = 0.01):
+        t0 = time.perf_counter()
+        t_rest = self.__t_end - time.monotonic()
+        if t_rest > 0:
+            time.sleep(t_rest)
+        while self.__transport.call('wave_tx_busy'):
+            time.sleep(interval)
+        if METRICS and self.__t_sent is not None:
+            METRICS.observe('remoteir_ir_tx_busy_seconds', time.perf_counter() - self.__t_sent)
+            self.__t_sent = None
+        t_rest = t_min - (time.perf_counter() - t0)
+        if t_rest > 0:
+            time.sleep(t_rest)
+
+    # Get statistics of the wavechain cache
+    def get_cache_stats(self):
+        return {'hits': self.__cache_hits, 'misses': self.__cache_misses, 'size': len(self.__chains)}
+
+    # Get statistics of the commands sent to pigpiod
+    def get_transport_stats(self):
+        return self.__transport.get_stats()
 
 # Test codes
 if __name__ == '__main__':
@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# metrics.py - Low-overhead metrics in the Prometheus text format
+# (c) 2021 @RR_Inyo
+# Released under the MIT license.
+# https://opensource.org/licenses/mit-license.php
+
+# Modules on the hot path, e.g., irxmit, hold a module variable METRICS, None by default.
+# They only take timestamps if it is set to a Registry, so that disabled metrics cost a single check.
+
+import bisect
+import threading
+import time
+
+# Upper bounds of histogram buckets, [s]
+BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Metrics exposed by this project: name, type, and help
+DEFINITIONS = [
+    ('remoteir_ir_encode_seconds', 'histogram', 'Time to encode a hexadecimal string into an LSB-first bitstream'),
+    ('remoteir_ir_synthesis_seconds', 'histogram', 'Time to synthesize a wavechain from a bitstream'),
+    ('remoteir_ir_wave_chain_seconds', 'histogram', 'Time to submit a wavechain to pigpiod'),
+    ('remoteir_ir_tx_busy_seconds', 'histogram', 'Time the transmitter stayed busy after a send'),
+    ('remoteir_csv_read_seconds', 'histogram', 'Time to read the latest sensor reading for the dashboard'),
+    ('remoteir_graph_render_seconds', 'histogram', 'Time to render the trend graph'),
+    ('remoteir_sends_total', 'counter', 'Number of IR commands sent, by device and command'),
+]
+
+# Escape a label value in the Prometheus text format
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# Histogram with fixed buckets
+class Histogram():
+    def __init__(self, buckets = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+# Registry of metrics
+class Registry():
+    # Constructor
+    def __init__(self, definitions = DEFINITIONS):
+        self.__lock = threading.Lock()
+        self.__definitions = definitions
+        self.__histograms = {name: Histogram() for name, kind, _ in definitions if kind == 'histogram'}
+        self.__counters = {name: {} for name, kind, _ in definitions if kind == 'counter'}
+
+    # Observe a value of a histogram
+    def observe(self, name, value):
+        with self.__lock:
+            self.__histograms[name].observe(value)
+
+    # Increment a counter with labels
+    def inc(self, name, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.__lock:
+            counter = self.__counters[name]
+            counter[key] = counter.get(key, 0) + 1
+
+    # Context manager to observe the time elapsed in its block
+    def timer(self, name):
+        return Timer(self, name)
+
+    # Render the metrics in the Prometheus text format, all of them or those whose names start with prefix,
+    # except those whose names start with exclude, e.g., rendered by another process
+    def render(self, prefix = '', exclude = None):
+        lines = []
+        with self.__lock:
+            for name, kind, help in self.__definitions:
+                if not name.startswith(prefix) or exclude is not None and name.startswith(exclude):
+                    continue
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {kind}')
+                if kind == 'histogram':
+                    h = self.__histograms[name]
+                    cumulative = 0
+                    for le, n in zip(h.buckets, h.counts):
+                        cumulative += n
+                        lines.append(f'{name}_bucket{{le="{le}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{le="+Inf"}} {h.count}')
+                    lines.append(f'{name}_sum {h.sum}')
+                    lines.append(f'{name}_count {h.count}')
+                else:
+                    for key, n in self.__counters[name].items():
+                        labels = ','.join(f'{k}="{escape(v)}"' for k, v in key)
+                        lines.append(f'{name}{{{labels}}} {n}')
+        return '\n'.join(lines) + '\n'
+
+# Timer as a context manager
+class Timer():
+    def __init__(self, registry, name):
+        self.__registry = registry
+        self.__name = name
+
+    def __enter__(self):
+        self.__t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.__registry.observe(self.__name, time.perf_counter() - self.__t0)
+        return False
+
+# Timer doing nothing, for disabled metrics
+class NullTimer():
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+NULL_TIMER = NullTimer()
+
+# Prefix of the metrics of the transmitter, taken by irxmit in the process owning it, e.g., the daemon
+IR_PREFIX = 'remoteir_ir_'
+
+# Registry shared by the web app
+registry = Registry()
@@ -0,0 +1,164 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# scheduler.py - In-process scheduler of timed actions
+# (c) 2021 @RR_Inyo
+# Released under the MIT license.
+# https://opensource.org/licenses/mit-license.php
+
+# The entries, one-shot, periodic, and cron-like, are kept in heaps ordered by the next time to run,
+# and run by a single thread sleeping on a condition variable until the earliest entry is due.
+# Insertion is O(log n), and an idle scheduler does not wake up at all.
+# Cancelled entries are only marked, and discarded when they reach the top of the heap.
+#
+# Delays and intervals are timed by the monotonic clock, and only entries at times of day, at() and cron(), by the wall clock,
+# which a Raspberry Pi without a real-time clock steps by NTP after boot.
+# A periodic entry skips the periods missed rather than running for each of them, and the wall clock is checked
+# at least every CLOCK_CHECK seconds while entries by it are waiting, so that they run in time after the clock is stepped.
+
+import datetime
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+# For debugging
+DEBUG = False
+
+CLOCK_CHECK = 60    # [s], longest sleep while entries by the wall clock are waiting
+
+# Next time matching a cron-like specification, strictly after t
+# minutes, hours: sorted lists, weekdays: set of weekdays (Monday is 0) or None for every day
+def next_cron(t, minutes, hours, weekdays):
+    dt = datetime.datetime.fromtimestamp(t).replace(second = 0, microsecond = 0) + datetime.timedelta(minutes = 1)
+    for day in range(0, 8):
+        d = dt.date() + datetime.timedelta(days = day)
+        if weekdays is not None and d.weekday() not in weekdays:
+            continue
+        for h in hours:
+            if day == 0 and h < dt.hour:
+                continue
+            for m in minutes:
+                if day == 0 and h == dt.hour and m < dt.minute:
+                    continue
+                return datetime.datetime.combine(d, datetime.time(h, m)).timestamp()
+    raise ValueError('Cron specification never matches.')
+
+# Entry of the scheduler
+class Entry():
+    def __init__(self, func, args, wall = False, interval = None, cron = None):
+        self.func = func
+        self.args = args
+        self.wall = wall            # Whether the times to run are by the wall clock rather than the monotonic clock
+        self.interval = interval    # [s], for periodic entries
+        self.cron = cron            # (minutes, hours, weekdays), for cron-like entries
+        self.cancelled = False
+
+    # Next time to run after running at time now, scheduled at time t, or None for one-shot entries
+    def next(self, t, now):
+        if self.interval is not None:
+            return max(t + self.interval, now)
+        if self.cron is not None:
+            return next_cron(max(t, now), *self.cron)
+        return None
+
+# Class of scheduler
+class Scheduler():
+    # Constructor
+    def __init__(self):
+        self.__heaps = {False: [], True: []}    # Entries by the monotonic clock, and by the wall clock
+        self.__seq = itertools.count()
+        self.__cond = threading.Condition()
+        self.__running = False
+        self.__thread = None
+
+    def __len__(self):
+        return sum(len(heap) for heap in self.__heaps.values())
+
+    # Start the scheduler thread
+    def start(self):
+        with self.__cond:
+            if self.__running:
+                return
+            self.__running = True
+        self.__thread = threading.Thread(target = self.__run, daemon = True)
+        self.__thread.start()
+
+    # Stop the scheduler thread
+    def stop(self):
+        with self.__cond:
+            self.__running = False
+            self.__cond.notify()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    # Push an entry at time t of its clock, waking up the thread only if it becomes the earliest one
+    def __push(self, t, entry):
+        with self.__cond:
+            heap = self.__heaps[entry.wall]
+            heapq.heappush(heap, (t, next(self.__seq), entry))
+            if heap[0][2] is entry:
+                self.__cond.notify()
+        return entry
+
+    # Run func(*args) once at time t, in seconds since the epoch
+    def at(self, t, func, *args):
+        return self.__push(t, Entry(func, args, wall = True))
+
+    # Run func(*args) once after delay seconds
+    def after(self, delay, func, *args):
+        return self.__push(time.monotonic() + delay, Entry(func, args))
+
+    # Run func(*args) every interval seconds, first after interval seconds
+    def every(self, interval, func, *args):
+        return self.__push(time.monotonic() + interval, Entry(func, args, interval = interval))
+
+    # Run func(*args) at matching times, like cron; None matches any minute, hour, or weekday
+    def cron(self, func, *args, minute = None, hour = None, weekday = None):
+        minutes = sorted(range(0, 60) if minute is None else [minute] if isinstance(minute, int) else minute)
+        hours = sorted(range(0, 24) if hour is None else [hour] if isinstance(hour, int) else hour)
+        weekdays = None if weekday is None else {weekday} if isinstance(weekday, int) else set(weekday)
+        entry = Entry(func, args, wall = True, cron = (minutes, hours, weekdays))
+        return self.__push(next_cron(time.time(), *entry.cron), entry)
+
+    # Cancel an entry
+    def cancel(self, entry):
+        entry.cancelled = True
+
+    # Scheduler thread
+    def __run(self):
+        while True:
+            with self.__cond:
+                # Sleep until the earliest entry of either clock is due
+                while self.__running:
+                    heap, wait = None, None
+                    for wall, h in self.__heaps.items():
+                        while h and h[0][2].cancelled:
+                            heapq.heappop(h)
+                        if not h:
+                            continue
+                        t, now = h[0][0], time.time() if wall else time.monotonic()
+                        if t <= now:
+                            heap = h
+                            break
+                        w = min(t - now, CLOCK_CHECK) if wall else t - now
+                        wait = w if wait is None else min(wait, w)
+                    if heap is not None:
+                        break
+                    self.__cond.wait(wait)
+                if not self.__running:
+                    return
+
+                # Reschedule periodic entries before running, so that a slow action does not shift the period
+                _, _, entry = heapq.heappop(heap)
+                t_next = entry.next(t, now)
+                if t_next is not None:
+                    heapq.heappush(heap, (t_next, next(self.__seq), entry))
+
+            if DEBUG: print(f'Running {entry.func} scheduled at {t}')
+            try:
+                entry.func(*entry.args)
+            except Exception:
+                traceback.print_exc()
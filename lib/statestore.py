@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# statestore.py - Persistent device state shared by processes
+# (c) 2021 @RR_Inyo
+# Released under the MIT license.
+# https://opensource.org/licenses/mit-license.php
+
+# The last-transmitted state of each device is kept in an SQLite database in WAL mode,
+# so that readers, e.g., dashboards of any web worker, never block the writer,
+# and each update is atomic and survives crashes and restarts.
+# Each state has a version, incremented on every update, for compare-and-set by senders.
+
+import json
+import sqlite3
+import threading
+import time
+
+# For debugging
+DEBUG = False
+
+STATE_DB = '/tmp/remoteir_state.db'
+
+# Class of state store
+class StateStore():
+    # Constructor
+    def __init__(self, path = STATE_DB):
+        self.__path = path
+        self.__local = threading.local()
+        db = self.__db()
+        db.execute('PRAGMA journal_mode = WAL')
+        db.execute('CREATE TABLE IF NOT EXISTS state (device TEXT PRIMARY KEY, version INTEGER NOT NULL, state TEXT NOT NULL, updated REAL NOT NULL)')
+        db.commit()
+
+    # Get the connection of the current thread, since SQLite connections may not be shared by threads
+    def __db(self):
+        db = getattr(self.__local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.__path, timeout = 5)
+            db.execute('PRAGMA synchronous = FULL')
+            self.__local.db = db
+        return db
+
+    # Get the version and the state of a device, or (0, None) if not stored yet
+    def get(self, device):
+        row = self.__db().execute('SELECT version, state FROM state WHERE device = ?', (device,)).fetchone()
+        if row is None:
+            return 0, None
+        return row[0], json.loads(row[1])
+
+    # Get the states of all the devices as a dictionary of device to state
+    def get_all(self):
+        rows = self.__db().execute('SELECT device, state FROM state').fetchall()
+        return {device: json.loads(state) for device, state in rows}
+
+    # Set the state of a device only if its version is still the expected one, returning whether it was set
+    def compare_and_set(self, device, version, state):
+        db = self.__db()
+        with db:
+            if version == 0:
+                cur = db.execute('INSERT OR IGNORE INTO state VALUES (?, 1, ?, ?)', (device, json.dumps(state), time.time()))
+            else:
+                cur = db.execute('UPDATE state SET version = version + 1, state = ?, updated = ? WHERE device = ? AND version = ?',
+                                 (json.dumps(state), time.time(), device, version))
+        if DEBUG: print(f'Compare-and-set of {device} at version {version}: {cur.rowcount == 1}')
+        return cur.rowcount == 1
+
+    # Set the state of a device unconditionally
+    def put(self, device, state):
+        db = self.__db()
+        with db:
+            db.execute('INSERT INTO state VALUES (?, 1, ?, ?) ON CONFLICT(device) DO UPDATE SET version = version + 1, state = excluded.state, updated = excluded.updated',
+                       (device, json.dumps(state), time.time()))
@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# thermostat.py - Thermostat control of an air conditioner with hysteresis
+# (c) 2021 @RR_Inyo
+# Released under the MIT license.
+# https://opensource.org/licenses/mit-license.php
+
+# The thermostat reads the latest room temperature, e.g., measured by the DHT22 sensor,
+# and turns the air conditioner on or off when the temperature leaves the band of target +/- hysteresis.
+# Only commands changing the state are sent, so that the air conditioner does not beep every step.
+# The state is read from the air conditioner, i.e., the last-transmitted state, every step,
+# so that commands sent otherwise, e.g., from the dashboard, are taken into account:
+# the air conditioner on in another mode or at another temperature is set to those of the thermostat, unless turned off.
+
+import datetime
+
+# For debugging
+DEBUG = False
+
+# Class of thermostat
+class Thermostat():
+    # Constructor
+    # ac: IRACPanasonic, or its proxy, read: function returning the latest (time, temperature, humidity), or None
+    def __init__(self, ac, read, mode = 'heating', target = 21, hysteresis = 0.5, max_age = 600):
+        if mode not in ['heating', 'cooling']:
+            raise ValueError('Unknown mode specified. Choose heating or cooling.')
+        self.__ac = ac
+        self.__read = read
+        self.__mode = mode
+        self.__target = target
+        self.__hysteresis = hysteresis
+        self.__max_age = max_age    # [s], readings older than this are ignored
+
+    # Change the target temperature, sending a command only if the air conditioner is on
+    def set_target(self, target):
+        self.__target = target
+        if self.__ac.get_state()['power']:
+            self.__turn_on()
+
+    # Whether the air conditioner is on in the mode and at the target of the thermostat, as last transmitted by anyone
+    def __is_set(self, state):
+        return state['power'] and state['mode'] == self.__mode and state['temp'] == self.__target
+
+    def __turn_on(self):
+        if self.__mode == 'heating':
+            self.__ac.on_heating(self.__target)
+        else:
+            self.__ac.on_cooling(self.__target)
+
+    def __turn_off(self):
+        self.__ac.off()
+
+    # Control step, to be called periodically, e.g., by the scheduler
+    def step(self):
+        reading = self.__read()
+        if reading is None:
+            if DEBUG: print('No reading, skipped')
+            return
+        t, temp, _ = reading
+        if (datetime.datetime.now() - t).total_seconds() > self.__max_age:
+            if DEBUG: print(f'Reading at {t} too old, skipped')
+            return
+
+        # Demand for heating or cooling, positive when the room is too cold or too hot, respectively
+        demand = self.__target - temp if self.__mode == 'heating' else temp - self.__target
+        state = self.__ac.get_state()
+        if demand <= -self.__hysteresis:
+            if state['power']:
+                if DEBUG: print(f'{temp} degree Celcius, turning off')
+                self.__turn_off()
+        elif (demand >= self.__hysteresis or state['power']) and not self.__is_set(state):
+            if DEBUG: print(f'{temp} degree Celcius, turning on, or setting mode and target')
+            self.__turn_on()
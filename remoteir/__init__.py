@@ -5,12 +5,13 @@
 # (c) 2021 Shigenori Inoue
 # A Python script to:
 # - define Flask object "app"
-# - load config
+# - load config, overridden by the file named by REMOTEIR_SETTINGS if any
 # - import views
 
 from flask import Flask
 
 app = Flask(__name__)
 app.config.from_object('remoteir.config')
+app.config.from_envvar('REMOTEIR_SETTINGS', silent = True)
 
 from remoteir.views import views
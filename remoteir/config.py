@@ -6,3 +6,38 @@
 DEBUG = False
 SECRET_KEY = 'XXXXX'
 PASSWORD = 'XXXXX'
+
+# Carrier of the IR transmitter, [Hz] and duty cycle, e.g., 1/3 to reduce the power and heat of the LEDs
+IR_CARRIER = 38000
+IR_DUTY = 0.5
+
+# Compiled codebook of IR commands, made by lib/codebook.py; None to encode commands at runtime
+CODEBOOK = None
+
+# Expose metrics at /metrics in the Prometheus text format; instrumentation costs nothing if False
+# With IRDAEMON, the metrics of the transmitter, remoteir_ir_*, are taken by the daemon, if run with --metrics.
+METRICS = False
+
+# Thermostat control of the air conditioner, e.g., {'mode': 'heating', 'target': 21, 'hysteresis': 0.5}; None to disable
+# With IRDAEMON, this is ignored; run the daemon with --thermostat instead.
+THERMOSTAT = None
+THERMOSTAT_INTERVAL = 60    # [s]
+
+# Unix domain socket of the transmitter daemon, lib/irdaemon.py, required with multiple web workers; None to transmit in-process
+IRDAEMON = None
+
+# State store of the devices, shared by processes and kept across restarts; None to keep states in memory
+STATE_DB = None
+
+# GPIO pin of the DHT22 to sample in the web process, or the shared memory of a sampler process, lib/dht22.py;
+# None for both to read the log file written by an external logger; only a single web worker can sample the GPIO pin,
+# so use a sampler process with multiple workers
+DHT22_GPIO = None
+DHT22_SHM = None
+
+# Log files of named sensors, e.g., {'リビング': '/tmp/DHT22_record.csv', '寝室': '/tmp/DHT22_bedroom.csv'};
+# None for the single DHT22 above
+SENSORS = None
+
+# Log file of the DHT22, tab-separated time, temperature, and humidity
+CSV_FILE = '/tmp/DHT22_record.csv'
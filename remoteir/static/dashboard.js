@@ -0,0 +1,79 @@
+// remoteir/static/dashboard.js
+// (c) 2021 Shigenori Inoue
+// Live update of the dashboard:
+// - send control actions by fetch() without reloading the page
+// - receive new sensor readings, device states, and control actions of other dashboards by Server-Sent Events
+
+// Show a message in place of the flashed ones, as an error if kind is 'danger'
+function showMessage(msg, kind) {
+    var div = document.createElement('div');
+    div.className = 'alert alert-' + (kind || 'info');
+    div.setAttribute('role', 'alert');
+    div.textContent = msg;
+    var messages = document.getElementById('messages');
+    messages.innerHTML = '';
+    messages.appendChild(div);
+}
+
+// Send control forms by fetch(), including the value of the button pressed
+// A failed request is never sent again, since the command may have been transmitted already.
+document.querySelectorAll('form[method="POST"]').forEach(function(form) {
+    form.addEventListener('submit', function(e) {
+        e.preventDefault();
+        var data = new FormData(form);
+        if (e.submitter && e.submitter.name) {
+            data.append(e.submitter.name, e.submitter.value);
+        }
+        fetch(form.action, {method: 'POST', body: data, headers: {'Accept': 'application/json'}, credentials: 'same-origin'})
+            .then(function(r) {
+                // Redirected to the login page if the session has expired
+                if (r.redirected && new URL(r.url).pathname === '/login') {
+                    window.location.href = '/login';
+                    return;
+                }
+                var type = r.headers.get('Content-Type') || '';
+                if (!r.ok || type.indexOf('application/json') !== 0) {
+                    showMessage('エラー！ 送信に失敗しました (' + r.status + ')', 'danger');
+                    return;
+                }
+                return r.json().then(function(r) { showMessage(r.message); });
+            })
+            .catch(function() { showMessage('エラー！ サーバーに接続できません', 'danger'); });
+    });
+});
+
+// Names of air conditioner modes
+var AC_MODES = {'heating': '暖房', 'cooling': '冷房', 'drying': 'ドライ'};
+
+// Receive events
+var source = new EventSource('/events');
+source.addEventListener('sensor', function(e) {
+    var env = JSON.parse(e.data);
+    document.getElementById('env-time').textContent = env.time;
+    document.getElementById('env-temp').textContent = env.temp_c;
+    document.getElementById('env-humidity').textContent = env.humidity;
+    document.querySelectorAll('tr[data-sensor]').forEach(function(tr) {
+        var sensor = env.sensors[tr.dataset.sensor];
+        if (sensor) {
+            tr.querySelector('.sensor-temp').textContent = sensor.temp_c;
+            tr.querySelector('.sensor-humidity').textContent = sensor.humidity;
+        }
+    });
+});
+source.addEventListener('states', function(e) {
+    var ac = JSON.parse(e.data).acPanasonic;
+    if (ac) {
+        document.getElementById('ac-state').textContent = '現在: ' + (ac.power ? AC_MODES[ac.mode] + ' ' + ac.temp + '°C' : '停止');
+    }
+});
+
+source.addEventListener('command', function(e) {
+    showMessage(JSON.parse(e.data).message);
+});
+
+// Request the trend graph at the resolution of the screen
+var graph = document.getElementById('trend-graph');
+if (graph) {
+    var w = Math.round(Math.min(document.body.clientWidth, 800) * (window.devicePixelRatio || 1));
+    graph.src = '/graph?w=' + Math.min(Math.max(w, 200), 2000);
+}
@@ -7,39 +7,163 @@
 # - control IR signal transmitters
 # - control temperature and humidity sensor
 
-# Import modules to manipulate CSV file
-import pandas as pd
-import csv
-
 # Import modules for Flask web app
-from flask import request, redirect, url_for, render_template, make_response, flash, session
+from flask import request, redirect, url_for, render_template, make_response, flash, session, abort, jsonify, Response, stream_with_context
 from remoteir import app
 import datetime
+import math
 import time
 
 # Import Matplotlib and related modules
 from io import BytesIO
+from collections import OrderedDict
+import hashlib
+import threading
+from PIL import Image, features
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import matplotlib.dates as mdates
 from matplotlib.backends.backend_agg import FigureCanvasAgg
 
 # Import modules for IR remote controller and DHT22 (aka AM2302) sensor
 import pigpio
-from lib import irxmit, irlightPanasonic, iracPanasonic
+from lib import irxmit, irlightPanasonic, iracPanasonic, codebook, metrics, scheduler, thermostat, irdaemon, statestore, eventhub, dht22, envdata
+
+# Enable metrics, if configured
+if app.config['METRICS']:
+    irxmit.METRICS = metrics.registry
 
-# Define pigpio instance
-pi = pigpio.pi()
+# Get a timer for metrics, doing nothing if metrics are disabled
+def timer(name):
+    return metrics.registry.timer(name) if app.config['METRICS'] else metrics.NULL_TIMER
+
+# Count a command sent, if metrics are enabled; only commands recognized and sent are to be counted
+def count_send(device, command):
+    if app.config['METRICS']:
+        metrics.registry.inc('remoteir_sends_total', device = device, command = command)
 
 # Define instances for IR remote controller
 GPIO_IR = 13
 T_WAIT = 0.3
-ir = irxmit.IRxmit(GPIO_IR, host = 'localhost', format = 'AEHA')
-ac = iracPanasonic.IRACPanasonic(ir)
-lightDining = irlightPanasonic.IRlightPanasonic(ir, ch = 1)
-lightLiving = irlightPanasonic.IRlightPanasonic(ir, ch = 2)
+
+# Lock of the transmitter, held by the control routes and the thermostat of this process from sending a command
+# until it is transmitted, so that neither wavechains nor the states of the devices are changed by two threads at once
+ir_lock = threading.Lock()
+
+# Define state store of the devices, read by the dashboard and written by the transmitting process
+store = statestore.StateStore(app.config['STATE_DB']) if app.config['STATE_DB'] else None
+
+# With the transmitter daemon, the devices are proxies and no waves are created in this process.
+if app.config['IRDAEMON']:
+    client = irdaemon.IRClient(app.config['IRDAEMON'])
+    ir = client.device('ir')
+    ac = client.device('ac')
+    lightDining = client.device('lightDining')
+    lightLiving = client.device('lightLiving')
+else:
+    ir = irxmit.IRxmit(GPIO_IR, host = 'localhost', format = 'AEHA', carrier = app.config['IR_CARRIER'], duty = app.config['IR_DUTY'])
+    cb = codebook.Codebook(app.config['CODEBOOK']) if app.config['CODEBOOK'] else None
+    ac = iracPanasonic.IRACPanasonic(ir, codebook = cb, store = store)
+    lightDining = irlightPanasonic.IRlightPanasonic(ir, ch = 1, codebook = cb, store = store)
+    lightLiving = irlightPanasonic.IRlightPanasonic(ir, ch = 2, codebook = cb, store = store)
 
 # Define filename to read DHT22 data
-CSV_FILE = '/tmp/DHT22_record.csv'
+CSV_FILE = app.config['CSV_FILE']
+
+# Define DHT22 sampler in this process, or attach to the readings of a sampler process, if configured
+# The sampler connects to pigpiod only if configured; the transmitter, if in this process, has a connection of its own.
+if app.config['DHT22_GPIO'] is not None:
+    pi = pigpio.pi()
+    sampler = dht22.DHT22Sampler(pi, app.config['DHT22_GPIO'], csv_file = CSV_FILE)
+    sampler.start()
+    sensor = sampler.buffer
+elif app.config['DHT22_SHM']:
+    sensor = dht22.SensorBuffer(app.config['DHT22_SHM'])
+else:
+    sensor = None
+
+# Define environment data of the sensors, each with its own time-indexed series
+# The first sensor is the primary one, shown in the upper table of the dashboard and used by the thermostat.
+environment = envdata.Environment()
+if app.config['SENSORS']:
+    for name, path in app.config['SENSORS'].items():
+        environment.add(name, envdata.CSVSeries(path))
+elif sensor is not None:
+    environment.add('DHT22', envdata.BufferSeries(sensor))
+else:
+    environment.add('DHT22', envdata.CSVSeries(CSV_FILE))
+
+# Get the latest reading of the primary sensor as (time, temperature, humidity), or None
+def read_latest():
+    return environment.latest()
+
+# Define scheduler of timed actions, and thermostat if configured
+# With the transmitter daemon, the thermostat runs in the daemon, rather than once per web worker.
+sched = scheduler.Scheduler()
+sched.start()
+if app.config['THERMOSTAT'] and not app.config['IRDAEMON']:
+    thermo = thermostat.Thermostat(ac, read_latest, **app.config['THERMOSTAT'])
+
+    # Control step, sending commands as the control routes do
+    def thermostat_step():
+        with ir_lock:
+            thermo.step()
+            ir.wait_idle()
+
+    sched.every(app.config['THERMOSTAT_INTERVAL'], thermostat_step)
+
+# Get the last-transmitted states of the devices, from the store if any, or of the air conditioner of this process or the daemon
+def get_states():
+    if store is not None:
+        return store.get_all()
+    return {iracPanasonic.IRACPanasonic.DEVICE: ac.get_state()}
+
+# Format the latest reading of a sensor for the dashboard
+def format_env(reading):
+    if reading is None:
+        return {'time': '-', 'temp_c': '-', 'humidity': '-'}
+    t, temp, humid = reading
+    return {'time': t.strftime('%Y/%m/%d %H:%M'), 'temp_c': temp, 'humidity': humid}
+
+# Poll new DHT22 readings of all the sensors and device states, changed by any process, for the event hub
+# A sensor event has the reading of the primary sensor, and those of all the sensors by name.
+polled = {'sensors': None, 'states': None}
+def poll_events():
+    events = []
+    envs = environment.latest_all()
+    times = {name: reading[0] if reading else None for name, reading in envs.items()}
+    if times != polled['sensors']:
+        polled['sensors'] = times
+        env = format_env(envs[environment.names()[0]])
+        env['sensors'] = {name: format_env(reading) for name, reading in envs.items()}
+        events.append(('sensor', env))
+    states = get_states()
+    if states != polled['states']:
+        polled['states'] = states
+        events.append(('states', states))
+    return events
+
+# Define event hub, a single producer shared by all the subscribers
+hub = eventhub.EventHub(poll_events)
+
+# Send a command by calling action(*args), and wait for the transmission to complete, and for a short time, T_WAIT in total
+# Only the busy wait is done by the transmitter, which may be the daemon serving all the workers one call at a time.
+def transmit(action, *args):
+    with ir_lock:
+        action(*args)
+        t0 = time.perf_counter()
+        ir.wait_idle()
+        t_rest = T_WAIT - (time.perf_counter() - t0)
+        if t_rest > 0:
+            time.sleep(t_rest)
+
+# Respond to a control action, with JSON to fetch() calls, or by redirecting to the dashboard otherwise
+def respond(msg, device, command):
+    hub.publish('command', {'device': device, 'command': command, 'message': msg})
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(message = msg)
+    flash(msg)
+    return redirect(url_for('show_dashboard'))
 
 # Login
 @app.route('/login', methods=['GET', 'POST'])
@@ -70,18 +194,16 @@ def show_dashboard():
     if not session.get('logged_in'):
         return redirect('/login')
 
-    # Get temperature and humidity data acquired by DHT22
-    # Read tail of CSV file and obtain latest data
-    df = pd.read_table(CSV_FILE)
-    latest = df.tail(1).values
-    t_raw = latest[0, 0]
-    t = datetime.datetime.strptime(t_raw, '%Y-%m-%d %H:%M:%S.%f')
-    t_srt = t.strftime('%Y/%m/%d %H:%M')
-    temp = latest[0, 1]
-    humid = latest[0, 2]
-    env = {'time': t_srt, 'temp_c': temp, 'humidity': humid}
+    # Get temperature and humidity data acquired by DHT22 sensors
+    # Obtain latest data of all the sensors in one call
+    with timer('remoteir_csv_read_seconds'):
+        envs = environment.latest_all()
+    env = format_env(envs[environment.names()[0]])
+
+    # Get the last-transmitted states of the devices
+    states = get_states()
 
-    return render_template('index.html', env = env)
+    return render_template('index.html', env = env, envs = envs, states = states)
 
 # Air conditioner control
 @app.route('/ac', methods=['POST'])
@@ -91,32 +213,36 @@ def acControl():
         return redirect(url_for('login'))
 
     # Get values from form
-    tempsetting = int(request.form['tempsetting'])
+    try:
+        tempsetting = int(request.form['tempsetting'])
+    except ValueError:
+        abort(400)
+    if tempsetting not in iracPanasonic.IRACPanasonic.TEMPS:
+        abort(400)
     command = request.form['command']
 
     # Send IR command to air conditoner
     if command == 'heating':
-        ac.on_heating(tempsetting)
+        transmit(ac.on_heating, tempsetting)
         msg = f'{tempsetting}°C設定で暖房運転を開始しました'
     elif command == 'cooling':
         if tempsetting >= 20:
-            ac.on_cooling(tempsetting)
+            transmit(ac.on_cooling, tempsetting)
             msg = f'{tempsetting}°C設定で冷房運転を開始しました'
         else:
-            msg = 'エラー！ 冷房の場合，温度を20°C以上に設定して下さい'
+            return respond('エラー！ 冷房の場合，温度を20°C以上に設定して下さい', 'ac', command)
     elif command == 'drying':
-        ac.on_drying(tempsetting)
+        transmit(ac.on_drying, tempsetting)
         msg = f'{tempsetting}°C設定でドライ運転を開始しました'
     elif command == 'off':
-        ac.off()
+        transmit(ac.off)
         msg = 'エアコンを停止しました'
-
-    # Wait for a short time
-    time.sleep(T_WAIT)
+    else:
+        abort(400)
+    count_send('ac', command)
 
     # Return to dashboard
-    flash(msg)
-    return redirect(url_for('show_dashboard'))
+    return respond(msg, 'ac', command)
 
 # Light at dining control
 @app.route('/lightDining', methods=['POST'])
@@ -130,24 +256,23 @@ def lightDiningControl():
 
     # Send IR command to the light
     if command == 'on':
-        lightDining.on()
+        transmit(lightDining.on)
         msg = 'ダイニングの照明を点灯しました'
     elif command == 'full':
-        lightDining.full()
+        transmit(lightDining.full)
         msg = 'ダイニングの照明を全灯にしました'
     elif command == 'night':
-        lightDining.night()
+        transmit(lightDining.night)
         msg = 'ダイニングの照明を常夜灯にしました'
     elif command == 'off':
-        lightDining.off()
+        transmit(lightDining.off)
         msg = 'ダイニングの照明を消灯しました'
-
-    # Wait for a short time
-    time.sleep(T_WAIT)
+    else:
+        abort(400)
+    count_send('lightDining', command)
 
     # Return to dashboard
-    flash(msg)
-    return redirect(url_for('show_dashboard'))
+    return respond(msg, 'lightDining', command)
 
 # Light at living control
 @app.route('/lightLiving', methods=['POST'])
@@ -161,71 +286,198 @@ def lightLivingControl():
 
     # Send IR command to the light
     if command == 'on':
-        lightLiving.on()
+        transmit(lightLiving.on)
         msg = 'リビングの照明を点灯しました'
     elif command == 'full':
-        lightLiving.full()
+        transmit(lightLiving.full)
         msg = 'リビングの照明を全灯にしました'
     elif command == 'night':
-        lightLiving.night()
+        transmit(lightLiving.night)
         msg = 'リビングの照明を常夜灯にしました'
     elif command == 'off':
-        lightLiving.off()
+        transmit(lightLiving.off)
         msg = 'リビングの照明を消灯しました'
-
-    # Wait for a short time
-    time.sleep(T_WAIT)
+    else:
+        abort(400)
+    count_send('lightLiving', command)
 
     # Return to dashboard
-    flash(msg)
-    return redirect(url_for('show_dashboard'))
+    return respond(msg, 'lightLiving', command)
 
-# PNG image of temperature and humidity trend graph made by Matplotlib
+# Server-Sent Events of new DHT22 readings and device states
+@app.route('/events')
+def events():
+    # Check logged-in status
+    if not session.get('logged_in'):
+        abort(401)
+
+    response = Response(stream_with_context(hub.stream()), mimetype = 'text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Formats of the trend graph, as (MIME type, Pillow format), None for formats rendered by Matplotlib itself
+# PNG is served unless another format is named in the Accept header, and the first one is preferred among those named equally.
+GRAPH_FORMATS = {
+    'webp': ('image/webp', 'WEBP'),
+    'png': ('image/png', 'PNG'),
+    'svg': ('image/svg+xml', None),
+}
+if not features.check('webp'):
+    del GRAPH_FORMATS['webp']
+
+# Sizes of the trend graph, so that a few renders serve any client and no client can force a render per request
+GRAPH_WIDTHS = (300, 450, 600, 900, 1200, 1600, 2000)
+GRAPH_HEIGHTS = (200, 300, 400, 600, 800, 1100, 1500)
+GRAPH_DPIS = (50, 75, 100, 150, 200, 300)
+
+# Span of the trend graph, up to the latest reading, as the longest of the time ticks, 24 hours apart, is for 48 hours of data
+GRAPH_SPAN = datetime.timedelta(hours = 48)
+
+# Define cache of encoded graphs, keyed by (data version, format, width, height, dpi), and graphs being rendered
+# The lock guards the two dictionaries only; graphs of different keys are rendered in parallel, each only once.
+GRAPH_CACHE_SIZE = 16
+graph_cache = OrderedDict()
+graph_rendering = {}
+graph_lock = threading.Lock()
+
+# Fonts of the trend graph, set once as Matplotlib reads them from its global settings
+# SVG keeps text as text rather than glyph outlines.
+G_FONTSIZE = 14
+G_FONT_FAMILY = 'IPAexGothic'
+plt.rcParams['font.family'] = G_FONT_FAMILY
+plt.rcParams['font.size'] = G_FONTSIZE
+plt.rcParams['svg.fonttype'] = 'none'
+
+# Get a size of the trend graph in the query, snapped up to one of the sizes given, or the largest of them
+def graph_size(name, default, sizes):
+    value = request.args.get(name, default, type = float)
+    if not math.isfinite(value):
+        abort(400)
+    return next((size for size in sizes if size >= value), sizes[-1])
+
+# Negotiate the format of the trend graph by the MIME types named in the Accept header, not by wildcards
+def graph_format():
+    named = {mimetype: q for mimetype, q in request.accept_mimetypes}
+    best, q_best = 'png', 0
+    for fmt, (mimetype, _) in GRAPH_FORMATS.items():
+        q = named.get(mimetype, 0)
+        if q > q_best:
+            best, q_best = fmt, q
+    return best
+
+# Image of temperature and humidity trend graph made by Matplotlib
+# Query parameters:
+# - fmt: png (palette-quantized), webp, or svg; negotiated by the Accept header if omitted, png if none is named
+# - w, h: size in pixels, 600 x 400 by default, h being 2/3 of w if omitted; snapped up to GRAPH_WIDTHS and GRAPH_HEIGHTS
+# - dpi: resolution, w / 6 by default so that the layout and the fonts scale with the width; snapped up to GRAPH_DPIS
 @app.route('/graph.png')
+@app.route('/graph')
 def graph():
-
-    # Define graph and font sizes
-    G_WIDTH = 6
-    G_HEIGHT = 4
-    G_FONTSIZE = 14
-    G_FONT_FAMILY = 'IPAexGothic'
-
-    # Read CSV file
-    with open('/tmp/DHT22_record.csv') as f:
-        reader = csv.reader(f, delimiter = '\t')
-        t, temp, humid = [], [], []
-        for l in reader:
-            t.append(datetime.datetime.strptime(l[0], '%Y-%m-%d %H:%M:%S.%f'))
-            temp.append(float(l[1]))
-            humid.append(float(l[2]))
+    # Negotiate format
+    fmt = request.args.get('fmt')
+    if fmt not in GRAPH_FORMATS:
+        fmt = graph_format()
+
+    # Get size within reasonable bounds for the CPU of the Raspberry Pi
+    w = graph_size('w', 600, GRAPH_WIDTHS)
+    h = graph_size('h', w * 2 // 3, GRAPH_HEIGHTS)
+    dpi = graph_size('dpi', w / 6, GRAPH_DPIS)
+
+    # Render graph, only once per data version, format, and size
+    key = (environment.version(), fmt, w, h, dpi)
+    data = get_graph(key, fmt, w, h, dpi)
+
+    # Generate and return response, letting browsers revalidate by ETag
+    response = Response(data, mimetype = GRAPH_FORMATS[fmt][0])
+    response.set_etag(hashlib.sha1(repr(key).encode()).hexdigest())
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept')
+    return response.make_conditional(request)
+
+# Get the graph of a key from the cache, or render it
+# A request for a graph being rendered waits for that render rather than starting another one.
+def get_graph(key, fmt, w, h, dpi):
+    while True:
+        with graph_lock:
+            data = graph_cache.get(key)
+            if data is not None:
+                graph_cache.move_to_end(key)
+                return data
+            rendering = graph_rendering.get(key)
+            if rendering is None:
+                rendering = graph_rendering[key] = threading.Event()
+                break
+        # Look up the cache again once rendered, or render if the render failed
+        rendering.wait()
+
+    try:
+        with timer('remoteir_graph_render_seconds'):
+            data = render_graph(fmt, w, h, dpi)
+        with graph_lock:
+            graph_cache[key] = data
+            if len(graph_cache) > GRAPH_CACHE_SIZE:
+                graph_cache.popitem(last = False)
+    finally:
+        with graph_lock:
+            del graph_rendering[key]
+        rendering.set()
+    return data
+
+# Render the trend graph in a format at a size in pixels
+# The figure is made without pyplot, whose state is global, so that graphs can be rendered in parallel.
+def render_graph(fmt = 'png', w = 600, h = 400, dpi = 100):
+    # Read DHT22 data of all the sensors over GRAPH_SPAN up to the latest reading, looked up in the time-indexed series
+    latest = [reading[0] for reading in environment.latest_all().values() if reading is not None]
+    data = environment.range(t0 = max(latest) - GRAPH_SPAN if latest else None)
+
+    # Decimate for SVG, whose size grows with the number of points, to about one point per two pixels
+    if fmt == 'svg':
+        for name, series in data.items():
+            step = -(-len(series[0]) // (w // 2))
+            if step > 1:
+                data[name] = tuple(x[::step] for x in series)
+    n = max([len(series[0]) for series in data.values()] + [0])
 
     # Define Matplotlib graph handler and adjustment
-    fig, ax = plt.subplots(2, 1, figsize = (G_WIDTH, G_HEIGHT))
+    fig = Figure(figsize = (w / dpi, h / dpi), dpi = dpi)
+    ax = fig.subplots(2, 1)
     #fig.patch.set_facecolor('lavender')
-    plt.subplots_adjust(left = 0.1, right = 0.95, bottom = 0.15, top = 0.95)
-    plt.rcParams['font.family'] = G_FONT_FAMILY
-    plt.rcParams["font.size"] = G_FONTSIZE
-    plt.subplots_adjust(hspace = 0.1)
+    fig.subplots_adjust(left = 0.1, right = 0.95, bottom = 0.15, top = 0.95)
+    fig.subplots_adjust(hspace = 0.1)
 
     # Set datetime format
-    if len(t) < 360:    # Data less than 6 hours
+    if n < 360:    # Data less than 6 hours
         tick = 1
-    elif len(t) < 720:  # Data less than 12 hours
+    elif n < 720:  # Data less than 12 hours
         tick = 3
-    elif len(t) < 1440: # Data less than 24 hours
+    elif n < 1440: # Data less than 24 hours
         tick = 6
-    elif len(t) < 2160: # Data less than 36 hours
+    elif n < 2160: # Data less than 36 hours
         tick = 8
-    elif len(t) < 2880: # Data less than 48 hours
+    elif n < 2880: # Data less than 48 hours
         tick = 12
-    else:               # Data equal to or longer than 48 hours
+    else:          # Data equal to or longer than 48 hours
         tick = 24
     xloc = mdates.HourLocator(byhour = range(0, 24, tick), tz = None)
     xfmt = mdates.DateFormatter('%m/%d\n%H:%M')
 
-    # Plot temperature
-    ax[0].fill_between(t, temp, color = 'firebrick', alpha = 0.2)
-    ax[0].plot(t, temp, label = '温度 [°C]', color = 'firebrick')
+    # Plot temperature and humidity, overlaying all the sensors
+    # A single sensor is plotted filled, multiple sensors as lines in different colors labeled with their names.
+    for i, (name, (t, temp, humid)) in enumerate(data.items()):
+        if len(data) == 1:
+            ax[0].fill_between(t, temp, color = 'firebrick', alpha = 0.2)
+            ax[0].plot(t, temp, label = '温度 [°C]', color = 'firebrick')
+            ax[1].fill_between(t, humid, color = 'royalblue', alpha = 0.2)
+            ax[1].plot(t, humid, label = '湿度 [%]', color = 'royalblue')
+        else:
+            ax[0].plot(t, temp, label = name, color = f'C{i}')
+            ax[1].plot(t, humid, label = name, color = f'C{i}')
+    if len(data) > 1:
+        ax[0].set_ylabel('温度 [°C]')
+        ax[1].set_ylabel('湿度 [%]')
+
+    # Format temperature axes
     ax[0].xaxis.set_major_locator(xloc)
     ax[0].xaxis.set_major_formatter(xfmt)
     ax[0].axes.xaxis.set_ticklabels([])
@@ -233,9 +485,7 @@ def graph():
     ax[0].legend(loc = 'lower left')
     ax[0].grid()
 
-    # Plot humidity
-    ax[1].fill_between(t, humid, color = 'royalblue', alpha = 0.2)
-    ax[1].plot(t, humid, label = '湿度 [%]', color = 'royalblue')
+    # Format humidity axes
     ax[1].xaxis.set_major_locator(xloc)
     ax[1].xaxis.set_major_formatter(xfmt)
     ax[1].set_ylim(10, 70)
@@ -245,11 +495,34 @@ def graph():
     # Output figure to canvas
     canvas = FigureCanvasAgg(fig)
     buf = BytesIO()
-    canvas.print_png(buf)
-    data = buf.getvalue()
-
-    # Generate and return response
-    response = make_response(data)
-    response.headers['Content-Type'] = 'image/png'
-    response.headers['Content-Length'] = len(data)
+    if fmt == 'svg':
+        # Paths are simplified by the decimation above, without changing the global settings of other renders
+        fig.savefig(buf, format = 'svg')
+    else:
+        # A few colors are enough for the plot, a fraction of the size of a full-color image
+        canvas.draw()
+        img = Image.frombuffer('RGBA', canvas.get_width_height(), canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1)
+        img = img.convert('RGB').quantize(colors = 64)
+        if fmt == 'webp':
+            img.save(buf, 'WEBP', lossless = True)
+        else:
+            img.save(buf, 'PNG', optimize = True)
+    return buf.getvalue()
+
+# Metrics in the Prometheus text format
+@app.route('/metrics')
+def show_metrics():
+    if not app.config['METRICS']:
+        abort(404)
+    # The transmitter is timed by the daemon, if any, run with --metrics
+    if app.config['IRDAEMON']:
+        text = metrics.registry.render(exclude = metrics.IR_PREFIX)
+        try:
+            text += client.device('metrics').render(metrics.IR_PREFIX)
+        except irdaemon.IRDaemonError:
+            pass
+    else:
+        text = metrics.registry.render()
+    response = make_response(text)
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4'
     return response
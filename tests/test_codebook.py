@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+# tests/test_codebook.py - Compilation and lookup of codebooks
+# Run with: python3 -m pytest tests
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lib import codebook, irframe
+
+def test_compile_and_lookup(tmp_path):
+    commands = codebook.collect()
+    path = str(tmp_path / 'codebook.bin')
+    codebook.compile_commands(commands, path)
+
+    cb = codebook.Codebook(path)
+    assert len(cb) == len(commands)
+    assert cb.keys() == sorted(f'{device}/{command}' for device, command in commands)
+    for (device, command), (format, s) in commands.items():
+        entry = cb.lookup(device, command)
+        assert entry.protocol == irframe.PROTOCOLS[format]
+        assert entry.frame == bytes.fromhex(s.replace('++', ''))
+        assert entry.chain == irframe.get_chain_descriptor(irframe.get_bitstream(s))
+
+def test_lookup_unknown(tmp_path):
+    path = str(tmp_path / 'codebook.bin')
+    codebook.compile_commands({('lightNEC', 'on'): ('NEC', '826da659')}, path)
+    with pytest.raises(KeyError):
+        codebook.Codebook(path).lookup('lightNEC', 'off')
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+# tests/test_irdaemon.py - Calls through the transmitter daemon
+# Run with: python3 -m pytest tests
+
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lib import irdaemon, metrics
+
+# Device counting the commands it sends
+class Device():
+    def __init__(self):
+        self.sent = 0
+
+    def on(self):
+        self.sent += 1
+        return self.sent
+
+    def slow(self, t):
+        time.sleep(t)
+        return self.on()
+
+# Serve in a thread until shut down
+def serve(d):
+    thread = threading.Thread(target = d.serve_forever, daemon = True)
+    thread.start()
+    return thread
+
+@pytest.fixture
+def daemon(tmp_path):
+    path = str(tmp_path / 'remoteir.sock')
+    device = Device()
+    d = irdaemon.IRDaemon({'light': device}, path)
+    thread = serve(d)
+    yield d, path, device
+    d.shutdown()
+    thread.join()
+
+def test_call(daemon):
+    d, path, device = daemon
+    light = irdaemon.IRClient(path).device('light')
+    assert light.on() == 1
+    assert light.on() == 2
+    with pytest.raises(irdaemon.IRDaemonError):
+        light.off()
+
+def test_timeout_not_resent(daemon):
+    d, path, device = daemon
+    light = irdaemon.IRClient(path, timeout = 0.1).device('light')
+    with pytest.raises(OSError):
+        light.slow(0.3)
+    time.sleep(0.3)
+    assert device.sent == 1
+    assert light.on() == 2
+
+def test_metrics(tmp_path):
+    path = str(tmp_path / 'remoteir.sock')
+    registry = metrics.Registry()
+    registry.observe('remoteir_ir_wave_chain_seconds', 0.001)
+    d = irdaemon.IRDaemon({'metrics': registry}, path)
+    thread = serve(d)
+    text = metrics.Registry().render(exclude = metrics.IR_PREFIX)
+    text += irdaemon.IRClient(path).device('metrics').render(metrics.IR_PREFIX)
+    d.shutdown()
+    thread.join()
+    types = [l for l in text.splitlines() if l.startswith('# TYPE')]
+    assert len(types) == len(metrics.DEFINITIONS)
+    assert 'remoteir_ir_wave_chain_seconds_count 1' in text.splitlines()
+
+def test_socket_in_use(daemon):
+    d, path, device = daemon
+    with pytest.raises(FileExistsError):
+        irdaemon.IRDaemon({}, path)
+    assert irdaemon.IRClient(path).device('light').on() == 1
+
+def test_stale_socket(tmp_path):
+    path = str(tmp_path / 'remoteir.sock')
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.bind(path)
+    s.close()
+    d = irdaemon.IRDaemon({}, path)
+    serve(d)
+    d.shutdown()
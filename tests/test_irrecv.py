@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+# tests/test_irrecv.py - Decoding of replayed edge streams by irrecv
+# Run with: python3 -m pytest tests
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lib import fakepigpio
+fakepigpio.install()
+
+from lib import irrecv
+
+def test_round_trip_aeha():
+    s = '2c52092d24'
+    assert irrecv.decode(*irrecv.encode_edges(s, 'AEHA')) == s
+
+def test_round_trip_nec():
+    s = '826da659'
+    assert irrecv.decode(*irrecv.encode_edges(s, 'NEC')) == s
+
+def test_round_trip_two_frames():
+    s = '0220e00400000006++0220e004004132809af00000066000008000165b'
+    assert irrecv.decode(*irrecv.encode_edges(s, 'AEHA')) == s
+
+def test_round_trip_tick_wraparound():
+    s = '2c52092e27'
+    assert irrecv.decode(*irrecv.encode_edges(s, 'AEHA', t0 = 0xffffffff - 20000)) == s
+
+def test_round_trip_random_frames():
+    rng = random.Random(0)
+    for i in range(0, 200):
+        format = rng.choice(['AEHA', 'NEC'])
+        frames = [bytes(rng.randrange(256) for k in range(0, rng.randint(1, 18))).hex() for j in range(0, rng.randint(1, 3))]
+        s = '++'.join(frames)
+        assert irrecv.decode(*irrecv.encode_edges(s, format, t0 = rng.randrange(1 << 32))) == s
+
+def test_active_high():
+    levels, ticks = irrecv.encode_edges('826da659', 'NEC')
+    assert irrecv.decode([1 - l for l in levels], ticks, active_low = False) == '826da659'
+
+def test_no_leader():
+    levels, ticks = irrecv.encode_edges('2c52092d24', 'AEHA')
+    assert irrecv.decode(levels[2:], ticks[2:]) is None
+    assert irrecv.decode([], []) is None
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+# tests/test_irxmit.py - Timing of the waveform elements synthesized by irxmit
+# Run with: python3 -m pytest tests
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lib import fakepigpio
+fakepigpio.install()
+
+import pigpio
+import pytest
+from lib import irframe, irxmit
+
+MASK = 1 << 13
+
+def test_elements_within_half_microsecond():
+    for carrier, duty in [(38000, 0.5), (33000, 0.2), (40000, 1 / 3), (36000, 0.5), (56000, 0.25)]:
+        for t_mark, t_total in [(3400, 5100), (425, 850), (425, 1700), (562.5, 1125), (9000, 13500)]:
+            pulses = irxmit.synthesize_element(MASK, t_mark, t_total, carrier, duty)
+            r = irxmit.verify_element(pulses, t_mark, t_total, carrier, duty)
+            assert abs(r['mark_error']) <= 0.5 and abs(r['space_error']) <= 0.5, (carrier, duty, t_mark, r)
+            assert sum(p.delay for p in pulses) == round(t_total)
+
+def test_mark_short_of_a_cycle():
+    # The last carrier cycle dropped: the 'off' before it, its 'on', and its 'off' with the space, merged into the space
+    pulses = list(irxmit.synthesize_element(MASK, 425, 850, 33000, 0.2))
+    pulses[-3:] = [pigpio.pulse(0, MASK, sum(p.delay for p in pulses[-3:]))]
+    r = irxmit.verify_element(pulses, 425, 850, 33000, 0.2)
+    assert abs(r['mark_error'] + 1e6 / 33000) < 1
+    assert abs(r['space_error'] - 1e6 / 33000) < 1
+
+def test_send_chain_protocol():
+    ir = irxmit.IRxmit(13, format = 'AEHA')
+    desc = irframe.get_chain_descriptor(irframe.get_bitstream('826da659'))
+    ir.send_chain(desc, irframe.PROTOCOLS['AEHA'])
+    ir.send_chain(desc)
+    with pytest.raises(ValueError):
+        ir.send_chain(desc, irframe.PROTOCOLS['NEC'])
+
+def test_carrier_out_of_range():
+    for carrier in [38, 1000, 600000]:
+        with pytest.raises(ValueError):
+            irxmit.IRxmit(13, carrier = carrier)
+    irxmit.IRxmit(13, format = 'NEC', carrier = 40000, duty = 1 / 3)
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+# tests/test_scheduler.py - Ordering, cancellation, cron specifications, and clock steps of the scheduler
+# Run with: python3 -m pytest tests
+
+import datetime
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lib import scheduler
+
+@pytest.fixture
+def sched():
+    s = scheduler.Scheduler()
+    s.start()
+    yield s
+    s.stop()
+
+def test_order(sched):
+    ran = []
+    done = threading.Event()
+    sched.after(0.06, ran.append, 3)
+    sched.after(0.02, ran.append, 1)
+    sched.at(time.time() + 0.04, ran.append, 2)
+    sched.after(0.08, done.set)
+    assert done.wait(2)
+    assert ran == [1, 2, 3]
+
+def test_cancel(sched):
+    ran = []
+    done = threading.Event()
+    entry = sched.after(0.02, ran.append, 'cancelled')
+    sched.every(0.01, ran.append, 'periodic')
+    sched.after(0.05, done.set)
+    sched.cancel(entry)
+    assert done.wait(2)
+    assert 'cancelled' not in ran and 'periodic' in ran
+
+def test_every_skips_missed_periods():
+    entry = scheduler.Entry(print, (), interval = 60)
+    assert entry.next(1000, 1010) == 1060
+    assert entry.next(1000, 90000) == 90000
+
+def test_every_ignores_wall_clock_step(sched, monkeypatch):
+    ran = []
+    sched.every(0.02, ran.append, 1)
+    t = time.time()
+    monkeypatch.setattr(time, 'time', lambda: t + 86400)
+    time.sleep(0.2)
+    assert 3 <= len(ran) <= 15
+
+def test_at_follows_wall_clock_step(sched, monkeypatch):
+    monkeypatch.setattr(scheduler, 'CLOCK_CHECK', 0.02)
+    done = threading.Event()
+    t = time.time()
+    sched.at(t + 3600, done.set)
+    time.sleep(0.05)
+    monkeypatch.setattr(time, 'time', lambda: t + 3600)
+    assert done.wait(2)
+
+def test_next_cron():
+    t = datetime.datetime(2021, 3, 1, 7, 30, 15).timestamp()   # Monday
+    def next_cron(minutes, hours, weekdays):
+        return datetime.datetime.fromtimestamp(scheduler.next_cron(t, minutes, hours, weekdays))
+    assert next_cron(range(0, 60), range(0, 24), None) == datetime.datetime(2021, 3, 1, 7, 31)
+    assert next_cron([0], [7], None) == datetime.datetime(2021, 3, 2, 7, 0)
+    assert next_cron([45], [7, 22], None) == datetime.datetime(2021, 3, 1, 7, 45)
+    assert next_cron([0], [6], {5, 6}) == datetime.datetime(2021, 3, 6, 6, 0)
+    with pytest.raises(ValueError):
+        scheduler.next_cron(t, [], [7], None)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+# tests/test_statestore.py - Compare-and-set of the state store, and the last-transmitted state of the air conditioner
+# Run with: python3 -m pytest tests
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lib import statestore, iracPanasonic
+
+# IR transmitter recording the frames sent, or failing to send if broken
+class Transmitter():
+    def __init__(self):
+        self.sent = []
+        self.broken = False
+
+    def send(self, s):
+        if self.broken:
+            raise OSError('pigpiod not reachable')
+        self.sent.append(s)
+
+@pytest.fixture
+def store(tmp_path):
+    return statestore.StateStore(str(tmp_path / 'state.db'))
+
+def test_get_missing(store):
+    assert store.get('ac') == (0, None)
+
+def test_compare_and_set_versions(store):
+    assert store.compare_and_set('ac', 0, {'power': True})
+    assert store.get('ac') == (1, {'power': True})
+    assert store.compare_and_set('ac', 1, {'power': False})
+    assert store.get('ac') == (2, {'power': False})
+
+def test_compare_and_set_conflict(store):
+    assert store.compare_and_set('ac', 0, {'power': True})
+    # Another sender has read version 1 and committed first
+    assert store.compare_and_set('ac', 1, {'power': False})
+    assert not store.compare_and_set('ac', 1, {'power': True})
+    assert not store.compare_and_set('ac', 0, {'power': True})
+    assert store.get('ac') == (2, {'power': False})
+
+def test_put_and_get_all(store):
+    store.put('light', {'command': 'on'})
+    store.put('light', {'command': 'off'})
+    assert store.get('light') == (2, {'command': 'off'})
+    assert store.get_all() == {'light': {'command': 'off'}}
+
+def test_ac_stores_only_sent_state(store):
+    ir = Transmitter()
+    ac = iracPanasonic.IRACPanasonic(ir, store = store)
+    ac.on_heating(22)
+    assert store.get(ac.DEVICE)[1]['temp'] == 22
+
+    ir.broken = True
+    with pytest.raises(OSError):
+        ac.on_cooling(26)
+    state = store.get(ac.DEVICE)[1]
+    assert (state['power'], state['mode'], state['temp']) == (True, 'heating', 22)
+    assert ac.get_state() == state
+
+def test_ac_rejects_temperature(store):
+    ir = Transmitter()
+    ac = iracPanasonic.IRACPanasonic(ir, store = store)
+    with pytest.raises(ValueError):
+        ac.on_heating(99)
+    assert ir.sent == []
+    assert store.get(ac.DEVICE) == (0, None)
+
+def test_ac_rebases_on_other_process(store):
+    ir = Transmitter()
+    ac_1 = iracPanasonic.IRACPanasonic(ir, store = store)
+    ac_2 = iracPanasonic.IRACPanasonic(ir, store = store)
+    ac_1.on_heating(23)
+    ac_2.off()
+    state = store.get(ac_1.DEVICE)[1]
+    assert (state['power'], state['mode'], state['temp']) == (False, 'heating', 23)
+    assert ac_1.get_state() == state
+
+def test_ac_sends_again_on_conflict(store):
+    ir = Transmitter()
+    ac = iracPanasonic.IRACPanasonic(ir, store = store)
+    ac.on_heating(22)
+
+    # Another process turns it off while this one is sending, so that this one sends again on the new status
+    other = iracPanasonic.IRACPanasonic(Transmitter(), store = store)
+    send = ir.send
+    def send_racing(s):
+        ir.send = send
+        other.off()
+        send(s)
+    ir.send = send_racing
+    ac.on_heating(25)
+
+    assert len(ir.sent) == 3
+    version, state = store.get(ac.DEVICE)
+    assert version == 3
+    assert (state['power'], state['mode'], state['temp']) == (True, 'heating', 25)
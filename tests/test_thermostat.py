@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+# tests/test_thermostat.py - Hysteresis control of the thermostat
+# Run with: python3 -m pytest tests
+
+import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lib import thermostat
+
+# Air conditioner recording the commands sent
+class AC():
+    def __init__(self, power = False, mode = 'heating', temp = 21):
+        self.state = {'power': power, 'mode': mode, 'temp': temp}
+        self.sent = []
+
+    def get_state(self):
+        return dict(self.state)
+
+    def on_heating(self, temp):
+        self.state = {'power': True, 'mode': 'heating', 'temp': temp}
+        self.sent.append(('heating', temp))
+
+    def on_cooling(self, temp):
+        self.state = {'power': True, 'mode': 'cooling', 'temp': temp}
+        self.sent.append(('cooling', temp))
+
+    def off(self):
+        self.state['power'] = False
+        self.sent.append(('off',))
+
+# Thermostat reading the temperatures given in turn, one per step
+def run(ac, temps, mode = 'heating', target = 21, **kwargs):
+    readings = iter(temps)
+    thermo = thermostat.Thermostat(ac, lambda: (datetime.datetime.now(), next(readings), 50), mode, target, **kwargs)
+    for _ in temps:
+        thermo.step()
+    return ac.sent
+
+def test_heating_hysteresis():
+    assert run(AC(), [21, 20.6, 20.5, 20.8, 21.4, 21.5, 21.2]) == [('heating', 21), ('off',)]
+
+def test_cooling_hysteresis():
+    assert run(AC(mode = 'cooling'), [26, 27, 26.5, 25], mode = 'cooling', target = 26, hysteresis = 1) == [('cooling', 26), ('off',)]
+
+def test_on_in_another_mode():
+    assert run(AC(power = True, mode = 'cooling', temp = 24), [21, 21]) == [('heating', 21)]
+
+def test_on_at_another_target():
+    assert run(AC(power = True, temp = 25), [20]) == [('heating', 21)]
+
+def test_off_in_band():
+    assert run(AC(), [21, 20.9, 21.1]) == []
+
+def test_turned_off_by_another():
+    ac = AC()
+    readings = iter([20, 20, 20])
+    thermo = thermostat.Thermostat(ac, lambda: (datetime.datetime.now(), next(readings), 50))
+    thermo.step()
+    ac.state['power'] = False
+    thermo.step()
+    thermo.step()
+    assert ac.sent == [('heating', 21), ('heating', 21)]
+
+def test_stale_or_missing_reading():
+    ac = AC()
+    old = datetime.datetime.now() - datetime.timedelta(hours = 1)
+    thermostat.Thermostat(ac, lambda: (old, 10, 50)).step()
+    thermostat.Thermostat(ac, lambda: None).step()
+    assert ac.sent == []